@@ -0,0 +1,12 @@
+-- Client-side dedupe key for the append-only currency_scores table
+-- Every engine run stamps its rows with one run_id; the writer upserts-ignore on
+-- (currency, run_id), so an insert retried after a timeout can't duplicate a run's rows
+-- Works for both the UUID and the SERIAL id variants of the table
+-- Run this in your Supabase SQL Editor: Dashboard → SQL Editor → New Query,
+-- then set CURRENCY_SCORES_RUN_ID=1 for the bias jobs to start sending run_id
+
+ALTER TABLE currency_scores ADD COLUMN IF NOT EXISTS run_id UUID;
+
+-- Rows written before the migration keep run_id NULL (NULLs never conflict)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_currency_scores_run
+ON currency_scores (currency, run_id);
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Local OHLC bar cache for Polygon / Yahoo history
+- SQLite file keyed by (ticker, interval, ts)
+- Tracks how far back each series is covered so callers only fetch missing bars
+- Serves (latest_close, oldest_close) windows straight from disk
+"""
+import os, sqlite3, threading
+
+# ----------------- CONFIG -----------------
+CACHE_DIR = os.getenv("PIPAURA_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+BAR_DB = os.path.join(CACHE_DIR, "bars.sqlite3")
+
+_local = threading.local()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS bars (
+  ticker   TEXT NOT NULL,
+  interval TEXT NOT NULL,
+  ts       TEXT NOT NULL,
+  open     REAL,
+  high     REAL,
+  low      REAL,
+  close    REAL NOT NULL,
+  source   TEXT,
+  PRIMARY KEY (ticker, interval, ts)
+);
+CREATE TABLE IF NOT EXISTS coverage (
+  ticker   TEXT NOT NULL,
+  interval TEXT NOT NULL,
+  start_ts TEXT NOT NULL,
+  PRIMARY KEY (ticker, interval)
+);
+"""
+
+def _conn():
+    """One connection per thread (market fetches run in a thread pool)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(BAR_DB, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        _local.conn = conn
+    return conn
+
+# ----------------- READS -----------------
+def fetch_start(ticker, interval, start_ts):
+    """
+    Where a provider fetch should begin to make the cache complete from `start_ts`
+    - Series not covered back to start_ts → start_ts (full backfill)
+    - Otherwise → the newest cached bar (re-fetched, it may have been partial)
+    """
+    conn = _conn()
+    row = conn.execute(
+        "SELECT start_ts FROM coverage WHERE ticker=? AND interval=?", (ticker, interval)
+    ).fetchone()
+    if not row or row[0] > start_ts:
+        return start_ts
+    last = conn.execute(
+        "SELECT MAX(ts) FROM bars WHERE ticker=? AND interval=?", (ticker, interval)
+    ).fetchone()[0]
+    return max(last, start_ts) if last else start_ts
+
+def load_closes(ticker, interval, start_ts):
+    """Return [(ts, close), ...] oldest → newest from start_ts onward"""
+    return _conn().execute(
+        "SELECT ts, close FROM bars WHERE ticker=? AND interval=? AND ts>=? ORDER BY ts",
+        (ticker, interval, start_ts),
+    ).fetchall()
+
+def window_closes(ticker, interval, start_ts):
+    """Return (latest_close, oldest_close) from the cache or None if fewer than 2 bars"""
+    rows = load_closes(ticker, interval, start_ts)
+    if len(rows) >= 2:
+        return rows[-1][1], rows[0][1]
+    return None
+
+# ----------------- WRITES -----------------
+def store_bars(ticker, interval, bars, covered_from, source=None):
+    """
+    Upsert bars and record that the series is complete from `covered_from`
+    bars: iterable of (ts, open, high, low, close)
+    """
+    conn = _conn()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO bars (ticker, interval, ts, open, high, low, close, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(ticker, interval, ts, o, h, l, c, source) for ts, o, h, l, c in bars],
+        )
+        conn.execute(
+            "INSERT INTO coverage (ticker, interval, start_ts) VALUES (?, ?, ?) "
+            "ON CONFLICT (ticker, interval) DO UPDATE SET start_ts=MIN(start_ts, excluded.start_ts)",
+            (ticker, interval, covered_from),
+        )
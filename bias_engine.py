@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Shared bias engine for every cadence
+- One rule set for currencies, FX pairs and indices (market rules: scoring_rules)
+- mode="weekly": TradingEconomics calendar + EconDB/FF macro + market flows (main.py)
+- mode="realtime": market flows + FF economic scores, then market drivers (hourly_update.py)
+- Writes currency_scores, fundamental_bias and index_bias, plus one versioned
+  bias_snapshots document per run (the consistent read path) once PUBLISH_BIAS_SNAPSHOTS=1
+- Unchanged pair/index rows are not rewritten (publish_state fingerprints)
+- Writes go through the local write-behind spool (write_spool), so runs don't wait on Supabase
+- Incremental runs insert currency history only downstream of a change (dependency graph over
+  the released currencies and the market inputs that moved since the last run)
+"""
+import os, uuid, datetime as dt
+import numpy as np
+from dateutil.relativedelta import relativedelta
+from fetch_fundamentals_free import combine_fundamental_scores
+from ff_integration import get_economic_scores
+from update_market_drivers import update_drivers, snapshot_from_scores
+from market_snapshot import get_market_snapshot, SNAPSHOT_TTL
+from http_client import http_get
+from rate_limiter import budget_report
+from publish_state import changed_rows, mark_published
+import write_spool
+from scoring_rules import (CURRENCY_RULES, INDEX_RULES, compile_rules, evaluate,
+                           component_scores, target_notes, build_dependency_graph,
+                           affected_nodes, economic_input)
+
+# ----------------- CONFIG -----------------
+# Full universe: 8 fiat currencies + 2 precious metals
+CURRENCIES = [
+    "USD","EUR","GBP","JPY","CAD","AUD","NZD","CHF",
+    "XAU","XAG"  # Gold and Silver
+]
+
+# Market quoting convention: the higher-ranked currency is the base (EUR/USD, XAU/JPY, CAD/CHF)
+PAIR_PRIORITY = ["XAU","XAG","EUR","GBP","AUD","NZD","USD","CAD","CHF","JPY"]
+
+def cross_pairs(universe=None):
+    """Every (base, quote) pair in the universe, ordered and oriented by PAIR_PRIORITY"""
+    ranked = [c for c in PAIR_PRIORITY if c in (universe or CURRENCIES)]
+    return [(ranked[i], ranked[j]) for i in range(len(ranked)) for j in range(i + 1, len(ranked))]
+
+# Published FX pairs: the full cross matrix (45 pairs for 10 currencies, metals included)
+PAIRS = cross_pairs()
+
+# Major global indices to score
+INDICES = [
+    ("US500","USD","S&P 500"),
+    ("US100","USD","Nasdaq 100"),
+    ("US30","USD","Dow Jones"),
+    ("UK100","GBP","FTSE 100"),
+    ("GER40","EUR","DAX 40"),
+    ("FRA40","EUR","CAC 40"),
+    ("EU50","EUR","EuroStoxx 50"),
+    ("JP225","JPY","Nikkei 225"),
+    ("HK50","HKD","Hang Seng"),
+    ("AUS200","AUD","ASX 200"),
+]
+
+# Central-bank tone: update weekly if you don't parse headlines yet.
+CENTRAL_BANK_TONE = {
+    "USD": "hawkish",
+    "EUR": "neutral",
+    "GBP": "neutral",
+    "JPY": "dovish",
+    "CAD": "dovish",
+    "AUD": "neutral",
+    "NZD": "neutral",
+    "CHF": "neutral",
+}
+
+# Weights
+W_DATA = {"low":1, "medium":2, "high":3}
+W_CB_TONE = 3
+
+# Market rule tables (scoring_rules), compiled once per process
+CURRENCY_TABLE = compile_rules(CURRENCY_RULES, CURRENCIES)
+INDEX_TABLE = compile_rules(INDEX_RULES, [code for code, _, _ in INDICES])
+
+# input → currency → pair/index graph for incremental runs
+DEPENDENCY_GRAPH = build_dependency_graph(CURRENCY_RULES, INDEX_RULES, CURRENCIES, PAIRS, INDICES)
+
+# Per-cadence behaviour
+MODES = {
+    "weekly": {
+        "calendar": True,          # TradingEconomics actual vs forecast
+        "macro": True,             # EconDB + FF RSS (combine_fundamental_scores)
+        "drivers": False,          # update_market_drivers
+        "horizon": 5,              # trading-day return read from the shared snapshot (daily bars)
+        "verbose": True,
+        "fallback_summary": "Weekly macro blend",
+        "ff_note": "FF economic events",
+    },
+    "realtime": {
+        "calendar": False,
+        "macro": False,
+        "drivers": True,
+        "horizon": 5,              # same scale as the rule thresholds (tuned on weekly moves)
+        "verbose": False,
+        "fallback_summary": "Real-time macro blend",
+        "ff_note": "Economic data",
+    },
+}
+
+# Env
+TE_KEY = os.getenv("TRADING_ECONOMICS_API_KEY")
+# Set to 1 after running create_bias_snapshots.sql; until then readers use the per-table rows
+PUBLISH_SNAPSHOTS = os.getenv("PUBLISH_BIAS_SNAPSHOTS", "0") == "1"
+# Set to 1 after running add_currency_scores_run_id.sql; until then currency_scores rows are plain inserts
+SCORES_RUN_ID = os.getenv("CURRENCY_SCORES_RUN_ID", "0") == "1"
+
+# ----------------- TIME WINDOW -----------------
+def recent_window():
+    """Last 7 days, ending at today's UTC midnight"""
+    end = dt.datetime.utcnow().replace(hour=0,minute=0,second=0,microsecond=0)
+    start = end - relativedelta(days=7)
+    return start, end
+
+# ----------------- PROVIDERS -----------------
+def fetch_tradingeconomics_calendar():
+    """Return dict[currency] -> list of {event, actual, forecast, importance} for last 7d."""
+    start, end = recent_window()
+    out = {c: [] for c in CURRENCIES}
+    if not TE_KEY:
+        return out
+    try:
+        url = ( "https://api.tradingeconomics.com/calendar"
+                f"?d1={start.date()}&d2={end.date()}&c=all&format=json&token={TE_KEY}" )
+        r = http_get(url); r.raise_for_status()
+        rows = r.json()
+        for row in rows:
+            ccy = row.get("Currency")
+            if ccy in out:
+                actual = row.get("Actual")
+                forecast = row.get("Forecast")
+                imp = (row.get("Importance") or "").lower()  # low/medium/high
+                ev = row.get("Event")
+                out[ccy].append({"event": ev, "actual": actual, "forecast": forecast, "importance": imp})
+    except Exception:
+        pass
+    return out
+
+# ----------------- SCORING -----------------
+def score_economic_data(events):
+    """Actual vs Forecast, weighted by importance."""
+    if not events: return 0, []
+    s, notes = 0, []
+    for ev in events:
+        a, f = ev.get("actual"), ev.get("forecast")
+        imp = ev.get("importance") or "low"
+        if a is None or f is None: continue
+        try:
+            aval = float(str(a).replace("%","").replace(",",""))
+            fval = float(str(f).replace("%","").replace(",",""))
+        except Exception:
+            continue
+        delta = 1 if aval > fval else (-1 if aval < fval else 0)
+        w = W_DATA.get(imp, 1)
+        s += delta * w
+        if delta != 0:
+            notes.append(f"{ev['event']} {'beat' if delta>0 else 'miss'} ({imp})")
+    return s, notes
+
+def score_cb_tone(tone):
+    if tone == "hawkish": return W_CB_TONE, ["CB: hawkish"]
+    if tone == "dovish":  return -W_CB_TONE, ["CB: dovish"]
+    return 0, []
+
+def bias_label(score):
+    if score >= 7:  return "Fundamentally Strong"
+    if score <= -7: return "Fundamentally Weak"
+    return "Neutral"
+
+def index_bias_label(score):
+    if score >= 3:  return "Fundamentally Strong"
+    if score <= -3: return "Fundamentally Weak"
+    return "Neutral"
+
+def score_indices(per_ccy, markets, fallback_summary="Weekly macro blend"):
+    """
+    Generates bias for global stock indices using risk sentiment, yields,
+    and home-currency influence (INDEX_RULES, one vectorized pass).
+    """
+    homes = [ccy for _, ccy, _ in INDICES]
+    home_scores = np.array([per_ccy.get(ccy, {}).get("total_score", 0) for ccy in homes], dtype=float)
+    fired, contrib = evaluate(INDEX_TABLE, markets, home_scores)
+    scores = contrib.sum(axis=1)
+
+    out = []
+    for t, (code, ccy, _) in enumerate(INDICES):
+        s = int(scores[t])
+        notes = target_notes(INDEX_TABLE, fired, t, ccy=ccy)
+
+        label = index_bias_label(s)
+        mag = min(abs(s), 6)
+        confidence = int(50 + (mag/6)*50) if s != 0 else 50
+        summary = "; ".join(notes[:3]) or fallback_summary
+
+        out.append({
+            "instrument": code,
+            "score": s,
+            "bias_text": label,
+            "summary": summary[:220],
+            "confidence": confidence,
+            "updated_at": dt.datetime.utcnow().isoformat()
+        })
+    return out
+
+# ----------------- DB HELPERS -----------------
+def insert_currency_scores(rows):
+    # Keyed on (currency, run_id) rather than id: currency_scores.id is SERIAL in some
+    # deployments (supabase_cron_tables.sql). One run_id per run, so a retried insert is ignored
+    if not SCORES_RUN_ID:
+        write_spool.enqueue("currency_scores", write_spool.INSERT, rows)
+        return
+    run_id = str(uuid.uuid4())
+    write_spool.enqueue("currency_scores", write_spool.INSERT,
+                        [dict(row, run_id=run_id) for row in rows], on_conflict="currency,run_id")
+
+def _upsert_changed(table, key, rows):
+    """
+    Spool only rows whose content moved since the last publish
+    - the spool flushes them as bulk upserts (write_spool.BATCH_ROWS per request)
+    Returns rows queued
+    """
+    rows, skipped = changed_rows(table, key, rows)
+    # Fingerprinted by the spool once delivered, so a dropped write is republished next run
+    write_spool.enqueue(table, write_spool.UPSERT, rows, on_conflict=key, fingerprint=True)
+    if skipped:
+        print(f"⏭️ {table}: {skipped} unchanged rows skipped, {len(rows)} queued")
+    return rows
+
+def upsert_pair_bias(rows):
+    return _upsert_changed("fundamental_bias", "pair", rows)
+
+def upsert_index_bias(rows):
+    return _upsert_changed("index_bias", "instrument", rows)
+
+def snapshot_doc(interval, per_ccy, pair_rows, index_rows):
+    """One run's complete output as a bias_snapshots document"""
+    return {
+        "generated_at": dt.datetime.utcnow().isoformat(),
+        "interval": interval,
+        "currencies": {ccy: {k: v for k, v in row.items() if k not in ("window_start", "window_end")}
+                       for ccy, row in per_ccy.items()},
+        "pairs": pair_rows,
+        "indices": index_rows,
+    }
+
+def publish_snapshot(mode, doc):
+    """Publish a snapshot in one insert; a new version replaces the last for readers"""
+    if not PUBLISH_SNAPSHOTS:
+        return
+    write_spool.enqueue("bias_snapshots", write_spool.INSERT, [{"mode": mode, "doc": doc}], on_conflict="id")
+
+# ----------------- ORCHESTRATION -----------------
+def one_line_reason(base, quote, per_ccy, fallback_summary="Weekly macro blend"):
+    qnotes = (per_ccy[quote]["notes"])[:2]
+    bnotes = (per_ccy[base]["notes"])[:1]
+    reason = "; ".join(qnotes + bnotes) or fallback_summary
+    return reason[:220]
+
+def score_currencies(mkt, mode="weekly", cal=None, macro_scores=None, economic_scores=None):
+    """Build per_ccy[currency] -> score row (with notes) for every currency in the universe"""
+    cfg = MODES[mode]
+    w_start, w_end = recent_window()
+    cal = cal or {}
+    macro_scores = macro_scores or {}
+
+    # Commodity + market-flow rules for every currency in one pass
+    fired, contrib = evaluate(CURRENCY_TABLE, mkt)
+    commodity = component_scores(CURRENCY_TABLE, contrib, "commodity")
+    market = component_scores(CURRENCY_TABLE, contrib, "market")
+
+    per_ccy = {}
+    for i, ccy in enumerate(CURRENCIES):
+        ds, dnotes = score_economic_data(cal.get(ccy, []))
+        cbs, cbnotes = score_cb_tone(CENTRAL_BANK_TONE.get(ccy))
+        cos, conotes = int(commodity[i]), target_notes(CURRENCY_TABLE, fired, i, "commodity")
+        ms, mnotes = int(market[i]), target_notes(CURRENCY_TABLE, fired, i, "market")
+
+        # Add macro scores from EconDB + ForexFactory
+        macro_score = macro_scores.get(ccy, 0)
+        macro_notes = [f"Macro data: {macro_score:+d}"] if macro_score != 0 else []
+
+        total = ds + cbs + cos + ms + macro_score
+
+        per_ccy[ccy] = {
+            "window_start": w_start.isoformat(),
+            "window_end":   w_end.isoformat(),
+            "currency": ccy,
+            "data_score": ds,
+            "cb_tone_score": cbs,
+            "commodity_score": cos,
+            "sentiment_score": 0,
+            "market_score": ms,
+            "total_score": total,
+            "notes": dnotes + cbnotes + conotes + mnotes + macro_notes
+        }
+
+    # Merge Forex Factory economic scores (from event-driven feed)
+    for currency, eco_score in (economic_scores or {}).items():
+        if currency in per_ccy:
+            per_ccy[currency]["total_score"] += eco_score
+            per_ccy[currency]["data_score"] += eco_score
+            if eco_score != 0:
+                per_ccy[currency]["notes"].append(f"{cfg['ff_note']}: {eco_score:+d}")
+
+    return per_ccy
+
+def currency_score_rows(per_ccy):
+    return [{
+        "window_start": r["window_start"],
+        "window_end":   r["window_end"],
+        "currency":     r["currency"],
+        "data_score":   r["data_score"],
+        "cb_tone_score":r["cb_tone_score"],
+        "commodity_score": r["commodity_score"],
+        "sentiment_score": r["sentiment_score"],
+        "market_score": r["market_score"],
+        "total_score":  r["total_score"],
+        "details": {"notes": r["notes"]}
+    } for r in per_ccy.values()]
+
+def build_pair_rows(per_ccy, fallback_summary="Weekly macro blend", pairs=None):
+    """
+    Pair biases for the whole cross matrix from the per-currency score vector
+    - total_bias = quote - base for every pair at once (outer difference)
+    - labels and confidence from vectorized thresholds
+    - pairs: optional subset of (base, quote) to publish (default PAIRS)
+    """
+    ranked = [c for c in PAIR_PRIORITY if c in per_ccy]
+    pos = {c: i for i, c in enumerate(ranked)}
+    scores = np.array([per_ccy[c]["total_score"] for c in ranked], dtype=np.int64)
+
+    # diff[i, j] = score[j] - score[i]: quote j minus base i
+    diff = scores[None, :] - scores[:, None]
+    pairs = [(b, q) for b, q in (PAIRS if pairs is None else pairs) if b in pos and q in pos]
+    bi = np.array([pos[b] for b, _ in pairs], dtype=np.int64)
+    qi = np.array([pos[q] for _, q in pairs], dtype=np.int64)
+    tb = diff[bi, qi]
+
+    labels = np.select([tb >= 7, tb <= -7], ["Fundamentally Strong", "Fundamentally Weak"], "Neutral")
+    mag = np.minimum(np.abs(tb), 12)
+    confidence = np.where(tb != 0, (50 + (mag / 12) * 50).astype(np.int64), 50)
+
+    updated_at = dt.datetime.utcnow().isoformat()
+    pair_rows = []
+    for k, (base, quote) in enumerate(pairs):
+        pair_rows.append({
+            "pair": f"{base}/{quote}",
+            "base_currency": base,
+            "quote_currency": quote,
+            "base_score": int(scores[bi[k]]),
+            "quote_score": int(scores[qi[k]]),
+            "total_bias": int(tb[k]),
+            "bias_text": str(labels[k]),
+            "summary": one_line_reason(base, quote, per_ccy, fallback_summary),
+            "confidence": int(confidence[k]),
+            "updated_at": updated_at
+        })
+    return pair_rows
+
+def change_scope(changed_currencies=None, changed_inputs=None):
+    """
+    Nodes to republish after a change, or None when nothing changed
+    - changed_currencies: currencies with new releases (e.g. ["USD"] after US CPI)
+    - changed_inputs: market inputs that moved (e.g. ["WTI"])
+    """
+    if not changed_currencies and not changed_inputs:
+        return None
+    inputs = [economic_input(c) for c in (changed_currencies or [])] + list(changed_inputs or [])
+    return affected_nodes(DEPENDENCY_GRAPH, inputs=inputs)
+
+def market_moves(mode, mkt):
+    """
+    Market inputs whose value differs from the one the last run of this mode scored
+    Returns (moved input names, rows to mark_published once this run's writes are queued)
+    """
+    rows = [{"input": key, "pct": pct} for key, pct in mkt.items()]
+    moved, _ = changed_rows(f"market_inputs_{mode}", "input", rows)
+    return [row["input"] for row in moved], rows
+
+def run(mode="weekly", interval=None, changed_currencies=None, changed_inputs=None,
+        economic_scores=None):
+    """
+    Score and publish one cycle
+    - mode: "weekly" or "realtime" (see MODES)
+    - interval: bar interval for market moves ("1d", "1h", "15m")
+    - changed_currencies / changed_inputs: incremental run; insert currency_scores only for
+      the currencies downstream of them plus any market input that moved since the last
+      run (see change_scope); default is a full run
+    - economic_scores: fresh FF scores from run_update(), merged over the economic_scores
+      table read (their spooled write may not have landed yet)
+    Unchanged pair/index rows are skipped by their publish_state fingerprints either way
+    """
+    cfg = MODES[mode]
+    incremental = bool(changed_currencies or changed_inputs)
+
+    cal = fetch_tradingeconomics_calendar() if cfg["calendar"] else {}
+    # Scheduled (full) runs score this cycle's prices: past the TTL they refresh synchronously.
+    # High-impact incremental runs are latency-critical: stale-while-revalidate
+    mkt = get_market_snapshot(interval=interval or "1d", max_stale=None if incremental else SNAPSHOT_TTL,
+                              verbose=cfg["verbose"], horizon=cfg["horizon"])
+
+    # A refreshed snapshot moves currencies beyond the released ones: widen the scope to
+    # everything downstream of the inputs that moved, so no pair mixes old and new scores
+    moved, market_rows = market_moves(mode, mkt)
+    scope = None
+    if incremental:
+        scope = change_scope(changed_currencies, list(changed_inputs or []) + moved)
+        print(f"🎯 Incremental run: {len(scope['currencies'])} currencies, "
+              f"{len(scope['pairs'])} pairs, {len(scope['indices'])} indices affected"
+              + (f" (market moves: {', '.join(moved)})" if moved else ""))
+
+    macro_scores = {}
+    if cfg["macro"]:
+        # Fetch free fundamental data (EconDB + ForexFactory)
+        print("\n🔄 Fetching free fundamental data sources...")
+        macro_scores = combine_fundamental_scores()
+
+    per_ccy = score_currencies(mkt, mode, cal=cal, macro_scores=macro_scores,
+                               economic_scores={**get_economic_scores(), **(economic_scores or {})})
+    score_rows = currency_score_rows(per_ccy)
+    if scope is not None:
+        score_rows = [r for r in score_rows if r["currency"] in scope["currencies"]]
+    insert_currency_scores(score_rows)
+
+    # Pairs and indices aren't cut to the scope: fingerprints already skip unchanged rows, so
+    # a scope filter could only hold back rows whose content changed (a mixed old/new state)
+    all_pair_rows = build_pair_rows(per_ccy, cfg["fallback_summary"])
+    pair_rows = upsert_pair_bias(all_pair_rows)
+
+    all_index_rows = score_indices(per_ccy, mkt, cfg["fallback_summary"])
+    index_rows = upsert_index_bias(all_index_rows)
+
+    # The full, consistent picture for readers (incremental runs included)
+    publish_snapshot(mode, snapshot_doc(interval or "1d", per_ccy, all_pair_rows, all_index_rows))
+
+    if cfg["drivers"] and (scope is None or score_rows):
+        # Update market drivers analysis from this run's scores (no re-read)
+        update_drivers(snapshot_from_scores(per_ccy, all_index_rows))
+
+    # The market inputs this run's rows were scored from (baseline for the next incremental run)
+    mark_published(f"market_inputs_{mode}", "input", market_rows)
+
+    # One-line completion log
+    timestamp = dt.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+    print(f"[{timestamp}] ✅ Updated ({mode}): {len(score_rows)} currencies, {len(pair_rows)} pairs, {len(index_rows)} indices")
+    budget_report()
+    return per_ccy
+
+if __name__ == "__main__":
+    import sys
+    run(sys.argv[1] if len(sys.argv) > 1 else "weekly")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+End-to-end check of the Polygon fetch path against a local stand-in server
+- Serves /v2/aggs (daily bars) and /v3/snapshot on localhost, points POLYGON_BASE_URL at it
+- Run 1 backfills every ticker through per-ticker aggregates (no cached history yet)
+- Run 2 must answer every ticker from a single snapshot request
+- --deny-snapshot: the snapshot endpoint answers 403; the denial must be remembered
+  by a fresh process (no second snapshot request) via the cache directory
+Uses a throwaway cache directory; exits non-zero if any expectation fails
+"""
+import os, sys, json, time, tempfile, threading, datetime as dt
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+DENY_SNAPSHOT = "--deny-snapshot" in sys.argv
+requests_seen = {"aggs": 0, "snapshot": 0}
+
+def _close(ticker, day):
+    return round(100 + sum(map(ord, ticker)) % 50 + day.toordinal() % 10, 2)
+
+class StandIn(BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if parts.path.startswith("/v2/aggs/ticker/"):
+            # /v2/aggs/ticker/{ticker}/range/1/day/{from}/{to}
+            segments = parts.path.split("/")
+            ticker, start, end = segments[4], segments[8], segments[9]
+            day, last = dt.date.fromisoformat(start), dt.date.fromisoformat(end)
+            results = []
+            while day <= last:
+                if day.weekday() < 5:
+                    ts = int(dt.datetime(day.year, day.month, day.day, tzinfo=dt.timezone.utc).timestamp() * 1000)
+                    c = _close(ticker, day)
+                    results.append({"t": ts, "o": c, "h": c, "l": c, "c": c})
+                day += dt.timedelta(days=1)
+            requests_seen["aggs"] += 1
+            self._reply(200, {"status": "OK", "results": results})
+        elif parts.path == "/v3/snapshot":
+            requests_seen["snapshot"] += 1
+            if DENY_SNAPSHOT:
+                self._reply(403, {"status": "NOT_AUTHORIZED"})
+                return
+            today = dt.datetime.utcnow().date()
+            tickers = parse_qs(parts.query).get("ticker.any_of", [""])[0].split(",")
+            results = [{"ticker": t, "session": {"close": _close(t, today) + 1},
+                        "last_updated": int(time.time() * 1e9)} for t in tickers if t]
+            self._reply(200, {"status": "OK", "results": results})
+        else:
+            self._reply(404, {"status": "NOT_FOUND"})
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Must be set before market_data (and its cache/rate-limit modules) are imported
+    os.environ["POLYGON_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["POLYGON_API_KEY"] = "stand-in"
+    os.environ["PIPAURA_CACHE_DIR"] = tempfile.mkdtemp(prefix="pipaura-check-")
+    os.environ.setdefault("RATE_LIMIT_POLYGON", "1000/60")
+    os.environ.setdefault("REQUEST_BUDGET_POLYGON", "0")
+    import market_data
+
+    failures = []
+
+    def run(label, expect_aggs, expect_snapshot):
+        before = dict(requests_seen)
+        quotes = market_data.get_percent_changes_hybrid(market_data.TICKER_MAP)
+        aggs = requests_seen["aggs"] - before["aggs"]
+        snapshot = requests_seen["snapshot"] - before["snapshot"]
+        sources = {key: q["source"] for key, q in quotes.items()}
+        print(f"{label}: {aggs} aggs, {snapshot} snapshot requests, sources {sources}")
+        if any(source != "Polygon" for source in sources.values()):
+            failures.append(f"{label}: not every ticker answered by Polygon")
+        if (aggs, snapshot) != (expect_aggs, expect_snapshot):
+            failures.append(f"{label}: expected {expect_aggs} aggs / {expect_snapshot} snapshot requests")
+
+    tickers = len(market_data.TICKER_MAP)
+    run("Run 1 (cold cache)", tickers, 0)
+    if DENY_SNAPSHOT:
+        run("Run 2 (snapshot denied)", tickers, 1)
+        # A new process starts with no in-memory state and must read the denial back
+        market_data._snapshot_denied_until = None
+        run("Run 3 (new process)", tickers, 0)
+    else:
+        run("Run 2 (warm cache)", 0, 1)
+
+    server.shutdown()
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print("✅ Polygon stand-in check passed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -53,6 +53,31 @@ export async function getIndexBias() {
   return data;
 }
 
+// Latest versioned bias snapshot: pairs, indices and currency scores from one engine run.
+// Falls back to the per-table reads until the first snapshot has been published.
+export async function getBiasSnapshot() {
+  const { data, error } = await supabase
+    .from('bias_snapshots')
+    .select('version, mode, created_at, doc')
+    .order('version', { ascending: false })
+    .limit(1)
+    .maybeSingle();
+
+  if (!error && data) {
+    return {
+      version: data.version,
+      mode: data.mode,
+      createdAt: data.created_at,
+      pairs: data.doc?.pairs ?? [],
+      indices: data.doc?.indices ?? [],
+      currencies: data.doc?.currencies ?? {},
+    };
+  }
+
+  const [pairs, indices] = await Promise.all([getFundamentalBias(), getIndexBias()]);
+  return { version: null, mode: null, createdAt: null, pairs, indices, currencies: {} };
+}
+
 export async function getMarketDrivers() {
   const { data, error } = await supabase
     .from('market_drivers')
@@ -4,7 +4,7 @@ import { Badge } from "@/components/ui/badge";
 import { Button } from "@/components/ui/button";
 import { Calendar, TrendingUp, TrendingDown, AlertCircle, ExternalLink, Gauge, Minus, Circle, RefreshCw } from "lucide-react";
 import { useQuery, useQueryClient } from "@tanstack/react-query";
-import { getFundamentalBias, getIndexBias, getMarketDrivers, getWeeklyEconomicEvents, getHighImpactEventCounts, getMarketNews, getThisWeekHighImpactEvents, getUserProfile } from "@/lib/supabase-service";
+import { getBiasSnapshot, getMarketDrivers, getWeeklyEconomicEvents, getHighImpactEventCounts, getMarketNews, getThisWeekHighImpactEvents, getUserProfile } from "@/lib/supabase-service";
 import { format, parseISO, formatDistanceToNow } from "date-fns";
 import { formatInTimeZone } from "date-fns-tz";
 import { useState } from "react";
@@ -47,17 +47,15 @@ export default function Fundamentals() {
     }
   };
 
-  const { data: fundamentalBias, isLoading: biasLoading } = useQuery({
-    queryKey: ['/api/fundamental-bias'],
-    queryFn: getFundamentalBias,
+  // Pairs and indices come from one snapshot so they always belong to the same run
+  const { data: biasSnapshot, isLoading: biasLoading } = useQuery({
+    queryKey: ['/api/bias-snapshot'],
+    queryFn: getBiasSnapshot,
     refetchInterval: 60000, // Auto-refresh every 60 seconds
   });
-
-  const { data: indexBias, isLoading: indexLoading } = useQuery({
-    queryKey: ['/api/index-bias'],
-    queryFn: getIndexBias,
-    refetchInterval: 60000,
-  });
+  const fundamentalBias = biasSnapshot?.pairs;
+  const indexBias = biasSnapshot?.indices;
+  const indexLoading = biasLoading;
 
   const { data: marketDrivers, isLoading: driversLoading } = useQuery({
     queryKey: ['/api/market-drivers'],
@@ -101,8 +99,7 @@ export default function Fundamentals() {
 
   const handleManualRefresh = async () => {
     setIsRefreshing(true);
-    await queryClient.invalidateQueries({ queryKey: ['/api/fundamental-bias'] });
-    await queryClient.invalidateQueries({ queryKey: ['/api/index-bias'] });
+    await queryClient.invalidateQueries({ queryKey: ['/api/bias-snapshot'] });
     await queryClient.invalidateQueries({ queryKey: ['/api/market-drivers'] });
     await queryClient.invalidateQueries({ queryKey: ['/api/weekly-events'] });
     await queryClient.invalidateQueries({ queryKey: ['/api/event-counts'] });
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Retention + compaction for the append-only currency_scores history
+- Raw rows are kept at full resolution for RAW_RETENTION_DAYS
+- Older raw rows → hourly rollups, archived to monthly parquet files, then deleted
+- Hourly rollups older than HOURLY_RETENTION_DAYS → daily rollups
+- Works one UTC day at a time; each day's rollup replaces the previous one and its rows are
+  deleted with one range delete, so a re-run after a failure is idempotent
+- Also prunes bias_snapshots versions older than SNAPSHOT_RETENTION_DAYS (PUBLISH_BIAS_SNAPSHOTS=1)
+- Run daily (e.g. `0 3 * * *`); tables: create_currency_scores_rollup.sql
+"""
+import os, json
+from datetime import datetime, timedelta, timezone
+from supabase_client import sb
+from bar_cache import CACHE_DIR
+
+# ----------------- CONFIG -----------------
+RAW_RETENTION_DAYS = int(os.getenv("CURRENCY_SCORES_RAW_DAYS", "7"))
+HOURLY_RETENTION_DAYS = int(os.getenv("CURRENCY_SCORES_HOURLY_DAYS", "90"))
+SNAPSHOT_RETENTION_DAYS = int(os.getenv("BIAS_SNAPSHOT_RETENTION_DAYS", "7"))
+PUBLISH_SNAPSHOTS = os.getenv("PUBLISH_BIAS_SNAPSHOTS", "0") == "1"
+ARCHIVE_DIR = os.getenv("CURRENCY_SCORES_ARCHIVE_DIR", os.path.join(CACHE_DIR, "archive"))
+
+PAGE_SIZE = 1000             # PostgREST default max rows per response
+SCORE_COLUMNS = ["data_score", "cb_tone_score", "commodity_score",
+                 "sentiment_score", "market_score", "total_score"]
+
+# ----------------- TIME -----------------
+def _ts(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def _day(ts):
+    return ts.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _hour(ts):
+    return ts.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+# ----------------- READS -----------------
+def _fetch_all(query_fn):
+    """Page through a query (query_fn() builds it fresh for each page)"""
+    rows, start = [], 0
+    while True:
+        page = query_fn().range(start, start + PAGE_SIZE - 1).execute().data
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        start += PAGE_SIZE
+
+def _oldest(table, column, **eq):
+    query = sb.table(table).select(column)
+    for key, value in eq.items():
+        query = query.eq(key, value)
+    result = query.order(column).limit(1).execute()
+    return _ts(result.data[0][column]) if result.data else None
+
+# ----------------- ROLLUPS -----------------
+def rollup(rows, resolution, bucket_fn, ts_column="created_at", weight_column=None):
+    """
+    Aggregate score rows into (currency, bucket) rollup rows
+    - weight_column: "samples" when rolling up rollups (weighted means)
+    """
+    groups = {}
+    for row in sorted(rows, key=lambda r: r[ts_column]):
+        key = (row["currency"], bucket_fn(_ts(row[ts_column])))
+        groups.setdefault(key, []).append(row)
+
+    out = []
+    for (ccy, bucket), group in groups.items():
+        weights = [row[weight_column] if weight_column else 1 for row in group]
+        samples = sum(weights)
+        total_key = "close_total_score" if weight_column else "total_score"
+        rolled = {
+            "currency": ccy,
+            "resolution": resolution,
+            "bucket": bucket.isoformat(),
+            "samples": samples,
+            "min_total_score": min(int(r["min_total_score" if weight_column else "total_score"]) for r in group),
+            "max_total_score": max(int(r["max_total_score" if weight_column else "total_score"]) for r in group),
+            "close_total_score": int(group[-1][total_key]),
+        }
+        for col in SCORE_COLUMNS:
+            rolled[col] = round(sum(float(r[col]) * w for r, w in zip(group, weights)) / samples, 3)
+        out.append(rolled)
+    return out
+
+def upsert_rollups(rows):
+    if rows:
+        sb.table("currency_scores_rollup").upsert(rows, on_conflict="currency,resolution,bucket").execute()
+
+# ----------------- ARCHIVE -----------------
+def archive_rows(rows):
+    """
+    Append raw rows to monthly parquet files (deduplicated on id)
+    Returns False if parquet support (pandas + pyarrow) is missing
+    """
+    try:
+        import pandas as pd
+        import pyarrow  # noqa: F401  (parquet engine)
+    except ImportError:
+        print("⚠️ pandas/pyarrow not installed; raw rows kept until they can be archived")
+        return False
+
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    df = pd.DataFrame(rows)
+    df["details"] = df["details"].map(lambda d: json.dumps(d) if not isinstance(d, str) else d)
+    df["month"] = df["created_at"].map(lambda v: _ts(v).strftime("%Y-%m"))
+
+    for month, part in df.groupby("month"):
+        path = os.path.join(ARCHIVE_DIR, f"currency_scores_{month}.parquet")
+        part = part.drop(columns="month")
+        if os.path.exists(path):
+            part = pd.concat([pd.read_parquet(path), part]).drop_duplicates("id", keep="last")
+        tmp = path + ".tmp"
+        part.sort_values("created_at").to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    return True
+
+# ----------------- COMPACTION -----------------
+def compact_raw(now=None):
+    """Raw rows older than RAW_RETENTION_DAYS → hourly rollups + archive, one day at a time"""
+    cutoff = _day(now or datetime.now(timezone.utc)) - timedelta(days=RAW_RETENTION_DAYS)
+    day = _oldest("currency_scores", "created_at")
+    days = 0
+    while day is not None and _day(day) < cutoff:
+        start = _day(day)
+        end = start + timedelta(days=1)
+        rows = _fetch_all(lambda: sb.table("currency_scores").select("*")
+                          .gte("created_at", start.isoformat()).lt("created_at", end.isoformat())
+                          .order("created_at"))
+        if not rows:
+            break
+        # Archive first: rollups next to still-present raw rows would count the day twice
+        if not archive_rows(rows):
+            break
+        upsert_rollups(rollup(rows, "hour", _hour))
+        sb.table("currency_scores").delete() \
+            .gte("created_at", start.isoformat()).lt("created_at", end.isoformat()).execute()
+        print(f"  {start.date()}: {len(rows)} raw rows → hourly, archived")
+        days += 1
+        day = _oldest("currency_scores", "created_at")
+    return days
+
+def compact_hourly(now=None):
+    """Hourly rollups older than HOURLY_RETENTION_DAYS → daily rollups, one day at a time"""
+    cutoff = _day(now or datetime.now(timezone.utc)) - timedelta(days=HOURLY_RETENTION_DAYS)
+    day = _oldest("currency_scores_rollup", "bucket", resolution="hour")
+    days = 0
+    while day is not None and _day(day) < cutoff:
+        start = _day(day)
+        end = start + timedelta(days=1)
+        hourly = lambda: (sb.table("currency_scores_rollup").select("*").eq("resolution", "hour")
+                          .gte("bucket", start.isoformat()).lt("bucket", end.isoformat()))
+        rows = _fetch_all(lambda: hourly().order("bucket"))
+        if not rows:
+            break
+        upsert_rollups(rollup(rows, "day", _day, ts_column="bucket", weight_column="samples"))
+        sb.table("currency_scores_rollup").delete().eq("resolution", "hour") \
+            .gte("bucket", start.isoformat()).lt("bucket", end.isoformat()).execute()
+        print(f"  {start.date()}: {len(rows)} hourly rollups → daily")
+        days += 1
+        day = _oldest("currency_scores_rollup", "bucket", resolution="hour")
+    return days
+
+def prune_snapshots(now=None):
+    """Drop bias_snapshots versions older than SNAPSHOT_RETENTION_DAYS (the latest always stays)"""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=SNAPSHOT_RETENTION_DAYS)
+    latest = sb.table("bias_snapshots").select("version").order("version", desc=True).limit(1).execute().data
+    if not latest:
+        return
+    sb.table("bias_snapshots").delete().lt("created_at", cutoff.isoformat()) \
+        .lt("version", latest[0]["version"]).execute()
+
+def run():
+    timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
+    print(f"[{timestamp}] Compacting currency_scores "
+          f"(raw {RAW_RETENTION_DAYS}d, hourly {HOURLY_RETENTION_DAYS}d, archive {ARCHIVE_DIR})")
+    raw_days = compact_raw()
+    hourly_days = compact_hourly()
+    if PUBLISH_SNAPSHOTS:
+        prune_snapshots()
+    print(f"[{timestamp}] ✅ Compacted: {raw_days} raw days, {hourly_days} hourly days")
+    return raw_days, hourly_days
+
+if __name__ == "__main__":
+    run()
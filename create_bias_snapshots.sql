@@ -0,0 +1,21 @@
+-- Versioned bias snapshots: one JSONB document per engine run
+-- A run's currencies, pairs and indices land in a single INSERT, so readers never see a
+-- half-updated mix; the frontend reads the highest version in one request
+-- Run this in your Supabase SQL Editor: Dashboard → SQL Editor → New Query,
+-- then set PUBLISH_BIAS_SNAPSHOTS=1 for the bias jobs to start publishing snapshots
+
+CREATE TABLE IF NOT EXISTS bias_snapshots (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),   -- set by the writer (idempotent retries)
+  version BIGSERIAL NOT NULL UNIQUE,               -- publish order
+  mode TEXT NOT NULL,                              -- weekly | realtime
+  doc JSONB NOT NULL,                              -- {generated_at, interval, currencies, pairs, indices}
+  created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_bias_snapshots_version
+ON bias_snapshots (version DESC);
+
+ALTER TABLE bias_snapshots ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "bias_snapshots_read_policy" ON bias_snapshots
+  FOR SELECT USING (true);
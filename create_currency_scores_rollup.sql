@@ -0,0 +1,47 @@
+-- Rollups + retention for the append-only currency_scores history
+-- Filled by compact_currency_scores.py (raw rows older than RAW_RETENTION_DAYS → hourly,
+-- hourly rollups older than HOURLY_RETENTION_DAYS → daily; raw rows are archived locally to parquet)
+-- Run this in your Supabase SQL Editor: Dashboard → SQL Editor → New Query
+
+CREATE TABLE IF NOT EXISTS currency_scores_rollup (
+  currency TEXT NOT NULL,
+  resolution TEXT NOT NULL CHECK (resolution IN ('hour', 'day')),
+  bucket TIMESTAMPTZ NOT NULL,
+  samples INT NOT NULL,
+  data_score NUMERIC NOT NULL DEFAULT 0,
+  cb_tone_score NUMERIC NOT NULL DEFAULT 0,
+  commodity_score NUMERIC NOT NULL DEFAULT 0,
+  sentiment_score NUMERIC NOT NULL DEFAULT 0,
+  market_score NUMERIC NOT NULL DEFAULT 0,
+  total_score NUMERIC NOT NULL DEFAULT 0,      -- mean over the bucket
+  min_total_score INT NOT NULL DEFAULT 0,
+  max_total_score INT NOT NULL DEFAULT 0,
+  close_total_score INT NOT NULL DEFAULT 0,    -- last value in the bucket
+  PRIMARY KEY (currency, resolution, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_currency_scores_rollup_bucket
+ON currency_scores_rollup (resolution, bucket);
+
+-- Range deletes of raw rows by age
+CREATE INDEX IF NOT EXISTS idx_currency_scores_created
+ON currency_scores (created_at);
+
+ALTER TABLE currency_scores_rollup ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "currency_scores_rollup_read_policy" ON currency_scores_rollup
+  FOR SELECT USING (true);
+
+-- One history read across resolutions: raw (recent) + hourly + daily
+CREATE OR REPLACE VIEW currency_scores_history AS
+SELECT currency, 'raw' AS resolution, created_at AS bucket, 1 AS samples,
+       data_score::NUMERIC, cb_tone_score::NUMERIC, commodity_score::NUMERIC,
+       sentiment_score::NUMERIC, market_score::NUMERIC, total_score::NUMERIC
+FROM currency_scores
+UNION ALL
+SELECT currency, resolution, bucket, samples,
+       data_score, cb_tone_score, commodity_score,
+       sentiment_score, market_score, total_score
+FROM currency_scores_rollup;
+
+GRANT SELECT ON currency_scores_history TO anon, authenticated, service_role;
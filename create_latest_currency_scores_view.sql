@@ -0,0 +1,14 @@
+-- Latest row per currency from the append-only currency_scores table
+-- Used by update_market_drivers.py for its single snapshot read
+-- Run this in your Supabase SQL Editor: Dashboard → SQL Editor → New Query
+
+CREATE INDEX IF NOT EXISTS idx_currency_scores_latest
+ON currency_scores (currency, created_at DESC);
+
+CREATE OR REPLACE VIEW latest_currency_scores AS
+SELECT DISTINCT ON (currency) *
+FROM currency_scores
+ORDER BY currency, created_at DESC;
+
+-- Same read access as the underlying table
+GRANT SELECT ON latest_currency_scores TO anon, authenticated, service_role;
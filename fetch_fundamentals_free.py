@@ -3,7 +3,7 @@ Free Fundamental Data Fetcher
 Integrates EconDB API and ForexFactory RSS for comprehensive fundamental analysis
 """
 
-import requests
+from http_client import http_get
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
 from typing import Dict, Optional
@@ -72,7 +72,7 @@ def fetch_econdb_indicator(ticker: str) -> Optional[Dict]:
     """
     try:
         url = f"https://www.econdb.com/api/series/{ticker}/?format=json"
-        response = requests.get(url, timeout=10)
+        response = http_get(url)
         
         if response.status_code != 200:
             print(f"⚠️ EconDB: Failed to fetch {ticker} (status {response.status_code})")
@@ -149,7 +149,7 @@ def fetch_forexfactory_calendar() -> list:
     """
     try:
         url = "https://cdn-nfs.faireconomy.media/ff_calendar_thisweek.xml"
-        response = requests.get(url, timeout=10)
+        response = http_get(url)
         
         if response.status_code != 200:
             print(f"⚠️ ForexFactory RSS: Failed to fetch (status {response.status_code})")
@@ -5,19 +5,20 @@ Forex Factory Full Calendar Refresh
 - Processes all events (high, medium, low impact)
 - Updates economic scores for macro background
 """
-import subprocess
 import sys
+import rate_limiter
+from forexfactory_feed import run_update
 
-# Run FF feed (all events)
-result = subprocess.run(
-    ["python", "forexfactory_feed.py"],
-    capture_output=True,
-    text=True
-)
+def run():
+    """Process every new release; returns the run_update() result"""
+    # Background refresh yields API quota to high-impact checks
+    rate_limiter.set_run_priority("low")
+    
+    result = run_update()
+    rate_limiter.budget_report()
+    return result
 
-# Print output
-print(result.stdout, end="")
-if result.stderr:
-    print(result.stderr, file=sys.stderr, end="")
-
-sys.exit(result.returncode)
+if __name__ == "__main__":
+    result = run()
+    # Same exit code as forexfactory_feed.py: 1 when high-impact events were processed
+    sys.exit(1 if result["high_impact"] else 0)
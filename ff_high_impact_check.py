@@ -4,38 +4,32 @@ Forex Factory High-Impact Event Check
 - Runs every 15 minutes
 - Checks for new high-impact (red folder) events
 - Triggers instant bias recalculation if new events found
+- Recalculation is incremental: only the released currencies and their pairs/indices
+- Feed check and recalculation run in one process (one interpreter, one Supabase client)
 """
-import subprocess
 import sys
+import rate_limiter
+from forexfactory_feed import run_update
 
-# Run FF feed with high-impact filter
-result = subprocess.run(
-    ["python", "forexfactory_feed.py", "--high-impact"],
-    capture_output=True,
-    text=True
-)
-
-# Print output
-print(result.stdout, end="")
-if result.stderr:
-    print(result.stderr, file=sys.stderr, end="")
-
-# If exit code 1, high-impact events were found → trigger bias recalc
-if result.returncode == 1:
-    print("🚨 High-impact events detected! Triggering instant bias update...")
+def run():
+    """Check the feed and rescore the released currencies; returns the run_update() result"""
+    # High-impact recalcs get first call on shared API quota (see rate_limiter)
+    rate_limiter.set_run_priority("high")
     
-    # Run hourly update to recalculate biases
-    recalc_result = subprocess.run(
-        ["python", "hourly_update.py"],
-        capture_output=True,
-        text=True
-    )
+    result = run_update(high_impact_only=True)
     
-    print(recalc_result.stdout, end="")
-    if recalc_result.stderr:
-        print(recalc_result.stderr, file=sys.stderr, end="")
+    if result["high_impact"]:
+        print("🚨 High-impact events detected! Triggering instant bias update...")
+        
+        # Imported here so a check that finds nothing never loads the bias engine
+        from hourly_update import run as run_hourly
+        run_hourly(changed_currencies=result["changed_currencies"],
+                   economic_scores=result["economic_scores"])
+    else:
+        rate_limiter.budget_report()
     
-    sys.exit(0)
-else:
-    # No high-impact events, normal exit
+    return result
+
+if __name__ == "__main__":
+    run()
     sys.exit(0)
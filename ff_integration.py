@@ -3,13 +3,7 @@
 Helper functions to integrate Forex Factory economic scores
 into the bias calculation system
 """
-import os
-from supabase import create_client
-
-SB_URL = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
-SB_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
-
-sb = create_client(SB_URL, SB_KEY)
+from supabase_client import sb
 
 def get_economic_scores():
     """
@@ -4,19 +4,29 @@ Forex Factory Economic Calendar Integration
 - Fetches this week's events from XML feed
 - Scores events based on actual vs forecast
 - Detects new high-impact releases for instant bias updates
+- run_update() returns a structured result (changed currencies, fresh scores) for in-process callers
+- Long-running processes keep the parsed calendar (conditional GET) and the processed IDs warm
 """
 import os
-import requests
 import xml.etree.ElementTree as ET
 from datetime import datetime
-from supabase import create_client
+from supabase_client import sb
+from http_client import http_get
+from rate_limiter import budget_report
+import write_spool
 
 # Config
 FF_FEED_URL = "https://nfs.faireconomy.media/ff_calendar_thisweek.xml"
-SB_URL = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
-SB_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 
-sb = create_client(SB_URL, SB_KEY)
+# Rows per forex_events bulk upsert
+EVENT_CHUNK = int(os.getenv("FF_EVENT_CHUNK", "200"))
+# Event IDs per processed-event lookup (keeps the PostgREST URL short)
+LOOKUP_CHUNK = 100
+
+# Warm state for long-running processes (scheduler_daemon)
+_feed_cache = {"etag": None, "last_modified": None, "text": None}
+_parsed_cache = {"text": None, "events": []}
+_seen_ids = set()            # event IDs known to be in forex_events
 
 # Currency mapping from country codes
 COUNTRY_TO_CURRENCY = {
@@ -38,10 +48,24 @@ IMPACT_WEIGHTS = {
 }
 
 def fetch_feed(timeout=15):
-    """Fetch Forex Factory XML feed with timeout"""
+    """
+    Fetch Forex Factory XML feed with timeout
+    - Conditional GET: an unchanged feed (304) returns the cached text without a download
+    """
+    headers = {}
+    if _feed_cache["text"] is not None:
+        if _feed_cache["etag"]:
+            headers["If-None-Match"] = _feed_cache["etag"]
+        if _feed_cache["last_modified"]:
+            headers["If-Modified-Since"] = _feed_cache["last_modified"]
     try:
-        response = requests.get(FF_FEED_URL, timeout=timeout)
+        response = http_get(FF_FEED_URL, timeout=timeout, headers=headers)
+        if response.status_code == 304:
+            return _feed_cache["text"]
         response.raise_for_status()
+        _feed_cache.update(etag=response.headers.get("ETag"),
+                           last_modified=response.headers.get("Last-Modified"),
+                           text=response.text)
         return response.text
     except Exception as e:
         print(f"⚠️ FF feed timeout: {e}")
@@ -84,6 +108,12 @@ def parse_events(xml_content):
     
     return events
 
+def load_events(xml_content):
+    """parse_events(), reusing the last parse when the feed text hasn't changed"""
+    if xml_content != _parsed_cache["text"]:
+        _parsed_cache.update(text=xml_content, events=parse_events(xml_content))
+    return list(_parsed_cache["events"])
+
 def score_event(actual, forecast, impact_weight):
     """
     Score an economic event based on actual vs forecast
@@ -112,36 +142,74 @@ def score_event(actual, forecast, impact_weight):
     except:
         return 0
 
-def get_processed_events():
-    """Get list of already processed event IDs from Supabase"""
+def get_processed_events(event_ids=None):
+    """
+    Get the already processed event IDs from Supabase
+    - event_ids: only look these up (the current feed's candidates), LOOKUP_CHUNK per request,
+      so the check stays bounded by the feed size instead of the table's history
+    - None: full scan of forex_events
+    """
     try:
-        result = sb.table("forex_events").select("event_id").execute()
-        return {row["event_id"] for row in result.data}
+        if event_ids is None:
+            result = sb.table("forex_events").select("event_id").execute()
+            return {row["event_id"] for row in result.data}
+
+        # IDs already confirmed in this process need no lookup
+        processed = set(event_ids) & _seen_ids
+        event_ids = sorted(set(event_ids) - processed)
+        for start in range(0, len(event_ids), LOOKUP_CHUNK):
+            chunk = event_ids[start:start + LOOKUP_CHUNK]
+            result = sb.table("forex_events").select("event_id").in_("event_id", chunk).execute()
+            found = {row["event_id"] for row in result.data}
+            processed |= found
+            _seen_ids.update(found)
+        return processed
     except:
         return set()
 
+def event_row(event_id, event_data, score):
+    """forex_events row for a processed event"""
+    # Map country to currency
+    currency = COUNTRY_TO_CURRENCY.get(event_data["country"], event_data["country"])
+
+    return {
+        "event_id": event_id,
+        "country": event_data["country"],
+        "currency": currency,
+        "title": event_data["title"],
+        "impact": event_data["impact"],
+        "actual": event_data["actual"],
+        "forecast": event_data["forecast"],
+        "previous": event_data.get("previous"),
+        "event_date": event_data.get("date"),
+        "event_time": event_data.get("time"),
+        "score": score,
+        "processed_at": datetime.utcnow().isoformat(),
+    }
+
+def mark_events_processed(rows):
+    """
+    Mark events as processed in Supabase
+    - bulk upsert on event_id, EVENT_CHUNK rows per request (idempotent on retry)
+    - a failed chunk is reported and the rest still go out
+    Returns the number of rows written
+    """
+    # One row per event_id: Postgres rejects an upsert that hits the same key twice
+    rows = list({row["event_id"]: row for row in rows}.values())
+    written = 0
+    for start in range(0, len(rows), EVENT_CHUNK):
+        chunk = rows[start:start + EVENT_CHUNK]
+        try:
+            sb.table("forex_events").upsert(chunk, on_conflict="event_id").execute()
+            written += len(chunk)
+            _seen_ids.update(row["event_id"] for row in chunk)
+        except Exception as e:
+            print(f"⚠️ Failed to mark events {start + 1}-{start + len(chunk)} processed: {e}")
+    return written
+
 def mark_event_processed(event_id, event_data, score):
-    """Mark an event as processed in Supabase"""
-    try:
-        # Map country to currency
-        currency = COUNTRY_TO_CURRENCY.get(event_data["country"], event_data["country"])
-        
-        sb.table("forex_events").insert({
-            "event_id": event_id,
-            "country": event_data["country"],
-            "currency": currency,
-            "title": event_data["title"],
-            "impact": event_data["impact"],
-            "actual": event_data["actual"],
-            "forecast": event_data["forecast"],
-            "previous": event_data.get("previous"),
-            "event_date": event_data.get("date"),
-            "event_time": event_data.get("time"),
-            "score": score,
-            "processed_at": datetime.utcnow().isoformat(),
-        }).execute()
-    except Exception as e:
-        print(f"⚠️ Failed to mark event processed: {e}")
+    """Mark a single event as processed in Supabase"""
+    mark_events_processed([event_row(event_id, event_data, score)])
 
 def aggregate_currency_scores(events):
     """
@@ -170,23 +238,36 @@ def aggregate_currency_scores(events):
     return currency_scores
 
 def update_economic_scores(currency_scores):
-    """Update economic_scores table in Supabase"""
+    """Queue economic_scores upserts (one bulk write via the write-behind spool)"""
     timestamp = datetime.utcnow().isoformat()
     
-    for currency, score in currency_scores.items():
-        try:
-            sb.table("economic_scores").upsert({
-                "currency": currency,
-                "total_score": round(score),
-                "last_updated": timestamp,
-            }, on_conflict="currency").execute()
-        except Exception as e:
-            print(f"⚠️ Failed to update score for {currency}: {e}")
+    write_spool.enqueue("economic_scores", write_spool.UPSERT, [{
+        "currency": currency,
+        "total_score": round(score),
+        "last_updated": timestamp,
+    } for currency, score in currency_scores.items()], on_conflict="currency")
+
+def update_result(status, new_events=0, high_impact=0, economic_scores=None):
+    """
+    Structured run_update() outcome
+    - status: "updated", "no_new_releases", "no_events" or "feed_unavailable"
+    - changed_currencies: currencies with new releases (sorted)
+    - economic_scores: {currency: score} just queued for economic_scores (may not be flushed yet)
+    """
+    economic_scores = economic_scores or {}
+    return {
+        "status": status,
+        "new_events": new_events,
+        "high_impact": high_impact,
+        "changed_currencies": sorted(economic_scores),
+        "economic_scores": economic_scores,
+    }
 
 def run_update(high_impact_only=False):
     """
     Main update function
     - high_impact_only: If True, only process High impact events (for 15-min checks)
+    Returns update_result(); result["high_impact"] > 0 means biases need a recalc
     """
     timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S UTC")
     
@@ -194,55 +275,56 @@ def run_update(high_impact_only=False):
     xml_content = fetch_feed()
     if not xml_content:
         print(f"[{timestamp}] ForexFactory update → Feed unavailable")
-        return False
+        return update_result("feed_unavailable")
     
     # Parse events
-    events = parse_events(xml_content)
+    events = load_events(xml_content)
     if not events:
         print(f"[{timestamp}] ForexFactory update → No events parsed")
-        return False
+        return update_result("no_events")
     
     # Filter for high impact only if requested
     if high_impact_only:
         events = [e for e in events if e["impact"] == "High"]
     
-    # Get processed events
-    processed_ids = get_processed_events()
-    
-    # Find new events with actual values
-    new_events = []
+    # Candidates: events with an actual value, keyed by a unique event ID
+    candidates = []
     for event in events:
-        # Create unique event ID
         event_id = f"{event['country']}_{event['title']}_{event['date']}"
-        
-        # Check if new and has actual value
-        if event_id not in processed_ids and event["actual"] is not None:
-            new_events.append((event_id, event))
+        if event["actual"] is not None:
+            candidates.append((event_id, event))
+    
+    # Look up only this feed's candidates, not the whole forex_events history
+    processed_ids = get_processed_events([event_id for event_id, _ in candidates])
+    new_events = [(event_id, event) for event_id, event in candidates if event_id not in processed_ids]
     
     if not new_events:
         print(f"[{timestamp}] ForexFactory update → No new releases")
-        return False
+        return update_result("no_new_releases")
     
     # Process new events
     all_events_data = []
+    event_rows = []
     for event_id, event in new_events:
         impact_weight = IMPACT_WEIGHTS.get(event["impact"], 1)
         score = score_event(event["actual"], event["forecast"], impact_weight)
         
         all_events_data.append(event)
-        mark_event_processed(event_id, event, score)
+        event_rows.append(event_row(event_id, event, score))
+    mark_events_processed(event_rows)
     
     # Aggregate and update scores
     currency_scores = aggregate_currency_scores(all_events_data)
     if currency_scores:
         update_economic_scores(currency_scores)
+    economic_scores = {currency: round(score) for currency, score in currency_scores.items()}
     
     # Count high impact
     high_impact_count = sum(1 for _, e in new_events if e["impact"] == "High")
     
     print(f"[{timestamp}] ForexFactory update → {len(new_events)} events parsed, {high_impact_count} high impact processed ✅")
     
-    return high_impact_count > 0  # Return True if high impact events were processed
+    return update_result("updated", len(new_events), high_impact_count, economic_scores)
 
 if __name__ == "__main__":
     import sys
@@ -251,10 +333,11 @@ if __name__ == "__main__":
     high_impact_only = "--high-impact" in sys.argv
     
     # Run update
-    has_high_impact = run_update(high_impact_only=high_impact_only)
+    result = run_update(high_impact_only=high_impact_only)
+    budget_report()
     
-    # Exit with code 1 if high impact events found (triggers bias recalc)
-    if has_high_impact:
+    # Exit with code 1 if high impact events found (for external schedulers chaining a recalc)
+    if result["high_impact"]:
         sys.exit(1)
     else:
         sys.exit(0)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP layer for every provider call (Polygon, EconDB, Forex Factory, TradingEconomics)
+- One pooled keep-alive session per host, reused for the whole process
+- Bounded connection pools
+- Jittered exponential backoff on 5xx (honours Retry-After, capped); 429 is retried only for
+  hosts without a rate-limit bucket, since a retry there would skip the token count
+- Per-host timeouts
+- Every call draws a token from its provider's rate-limit bucket (rate_limiter)
+"""
+import os, random, threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import rate_limiter
+
+# ----------------- CONFIG -----------------
+# Seconds per request; anything not listed uses DEFAULT_TIMEOUT
+HOST_TIMEOUTS = {
+    "api.polygon.io": 10,
+    "www.econdb.com": 10,
+    "nfs.faireconomy.media": 15,
+    "cdn-nfs.faireconomy.media": 10,
+    "api.tradingeconomics.com": 20,
+}
+DEFAULT_TIMEOUT = 10
+
+# host -> rate_limiter provider
+PROVIDER_HOSTS = {
+    "api.polygon.io": "polygon",
+    "www.econdb.com": "econdb",
+    "nfs.faireconomy.media": "forexfactory",
+    "cdn-nfs.faireconomy.media": "forexfactory",
+    "api.tradingeconomics.com": "tradingeconomics",
+}
+
+POOL_CONNECTIONS = 2
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "8"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Servers may answer with Retry-After: 60; never park a run that long
+MAX_RETRY_AFTER = float(os.getenv("HTTP_MAX_RETRY_AFTER", "10"))
+# Providers whose read timeouts aren't retried (3 × 10s would blow the market-fetch deadline);
+# connection errors and 429/5xx are still retried
+NO_READ_RETRY = {"polygon"}
+
+_sessions = {}
+_lock = threading.Lock()
+
+class JitteredRetry(Retry):
+    """Full-jitter backoff: sleep a random amount up to the exponential step"""
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+    def parse_retry_after(self, retry_after):
+        return min(super().parse_retry_after(retry_after), MAX_RETRY_AFTER)
+
+class QuotaRetry(JitteredRetry):
+    """For providers with a rate-limit bucket: a 429 is never retried, even with Retry-After"""
+    RETRY_AFTER_STATUS_CODES = JitteredRetry.RETRY_AFTER_STATUS_CODES - {429}
+
+def _build_session(provider=None):
+    # Each attempt below the adapter is uncounted by rate_limiter: for a provider with a
+    # bucket, a 429 goes back to the caller (which falls back) instead of burning more quota
+    statuses = RETRY_STATUSES if provider is None else tuple(s for s in RETRY_STATUSES if s != 429)
+    retry = (JitteredRetry if provider is None else QuotaRetry)(
+        total=MAX_RETRIES,
+        connect=MAX_RETRIES,
+        read=0 if provider in NO_READ_RETRY else MAX_RETRIES,
+        status=MAX_RETRIES,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=statuses,
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=POOL_CONNECTIONS,
+        pool_maxsize=POOL_MAXSIZE,
+        pool_block=True,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "pipaura-bias-engine/1.0", "Connection": "keep-alive"})
+    return session
+
+def get_session(url, provider=None):
+    """Return the shared session for the URL's host (and provider), creating it on first use"""
+    key = (urlsplit(url).netloc, provider)
+    session = _sessions.get(key)
+    if session is None:
+        with _lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _sessions[key] = _build_session(provider)
+    return session
+
+def host_timeout(url):
+    return HOST_TIMEOUTS.get(urlsplit(url).hostname, DEFAULT_TIMEOUT)
+
+def http_get(url, timeout=None, provider=None, max_wait=None, **kwargs):
+    """
+    GET through the pooled session for the URL's host
+    - provider: rate-limit bucket to draw from (defaults to the host's entry in PROVIDER_HOSTS)
+    - max_wait: longest wait for a rate-limit token (defaults to rate_limiter.MAX_WAIT)
+    Returns the final requests.Response (after retries); connection errors still raise,
+    and rate_limiter.BudgetExhausted is raised when the provider has no quota left
+    """
+    provider = provider or PROVIDER_HOSTS.get(urlsplit(url).hostname)
+    if provider:
+        rate_limiter.acquire(provider, max_wait=max_wait)
+    return get_session(url, provider).get(url, timeout=timeout or host_timeout(url), **kwargs)
+
+def close_sessions():
+    """Drop every pooled connection (long-running processes / tests)"""
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+"""
+Hybrid market data fetcher shared by the weekly and 30-min bias engines
+- Polygon.io first (one bulk snapshot request, per-ticker aggregates as fallback), Yahoo Finance fallback
+- All tickers fetched concurrently under one per-run deadline
+- Yahoo fallback batched into a single multi-ticker download
+- Per-ticker results report which provider answered
+- Daily/intraday bars cached on disk (bar_cache) so each cycle only fetches the newest bars
+- Circuit breaker (provider_health) skips a failing provider until its half-open probe
+- 1/5/20/60-day returns for every ticker from one cached history (fetch_returns)
+"""
+import os, json, time, datetime as dt
+from concurrent.futures import ThreadPoolExecutor, wait
+import numpy as np
+import bar_cache
+import provider_health
+import rate_limiter
+from http_client import http_get, host_timeout
+
+# ----------------- CONFIG -----------------
+POLYGON_API_KEY = os.getenv("POLYGON_API_KEY")
+# Override to point the Polygon calls at a local stand-in server
+POLYGON_BASE_URL = os.getenv("POLYGON_BASE_URL", "https://api.polygon.io").rstrip("/")
+
+# Ticker mappings: {key: (polygon_ticker, yahoo_ticker)}
+TICKER_MAP = {
+    "DXY": ("I:DXY", "DX-Y.NYB"),
+    "WTI": ("C:CLUSD", "CL=F"),
+    "GOLD": ("C:XAUUSD", "GC=F"),
+    "COPPER": ("C:XCUUSD", "HG=F"),
+    "SPX": ("I:SPX", "^GSPC"),
+    "UST10Y": ("I:US10Y", "^TNX"),
+    "VIX": ("I:VIX", "^VIX"),
+}
+
+# Whole-run budget (seconds) for the concurrent fetch; tickers with no data when it
+# expires are reported as "Timeout" with pct None (missing, not a 0% move)
+FETCH_DEADLINE = float(os.getenv("MARKET_FETCH_DEADLINE", "25"))
+# Part of the deadline Polygon never gets: the batched Yahoo fallback always runs in it
+YAHOO_RESERVE = float(os.getenv("MARKET_YAHOO_RESERVE", "8"))
+
+# Trading-day horizons for the multi-horizon returns table
+HORIZONS = (1, 5, 20, 60)
+
+# Bar intervals: {interval: (polygon multiplier, polygon timespan, yahoo interval)}
+INTERVALS = {
+    "1d": (1, "day", "1d"),
+    "1h": (1, "hour", "60m"),
+    "15m": (15, "minute", "15m"),
+}
+
+# A cached series whose newest bar is at most this old only needs today's bar
+SNAPSHOT_MAX_GAP_DAYS = 4
+# After a 401/403 on the snapshot endpoint, no process retries it for this long (seconds)
+SNAPSHOT_STATE_FILE = os.path.join(bar_cache.CACHE_DIR, "polygon_snapshot.json")
+SNAPSHOT_RECHECK = float(os.getenv("POLYGON_SNAPSHOT_RECHECK", str(24 * 3600)))
+
+_snapshot_denied_until = None   # loaded from SNAPSHOT_STATE_FILE on first use
+
+# ----------------- PROVIDERS -----------------
+def _bar_ts(when, interval):
+    """Cache key for a bar: ISO date for daily bars, ISO minute (UTC) for intraday"""
+    return when.strftime("%Y-%m-%d" if interval == "1d" else "%Y-%m-%dT%H:%M")
+
+def _polygon_bound(ts):
+    """Polygon range bound: a plain date, or epoch ms for an intraday cache key"""
+    if len(ts) == 10:
+        return ts
+    return int(dt.datetime.strptime(ts, "%Y-%m-%dT%H:%M").replace(tzinfo=dt.timezone.utc).timestamp() * 1000)
+
+def _remaining(deadline):
+    """Seconds left before a time.monotonic() deadline (None = no deadline)"""
+    return None if deadline is None else deadline - time.monotonic()
+
+def _call_timeout(url, deadline):
+    """Per-request timeout that can't run past the deadline"""
+    remaining = _remaining(deadline)
+    return host_timeout(url) if remaining is None else max(0.1, min(host_timeout(url), remaining))
+
+def get_polygon_price(ticker, days=7, interval="1d", deadline=None):
+    """
+    Fetch closing prices using Polygon.io
+    Only bars from the newest cached one onward are requested; the window is served from the bar cache
+    - deadline: time.monotonic() value the call must finish by
+    Returns (latest_close, oldest_close) or None if unavailable
+    """
+    if not POLYGON_API_KEY or not provider_health.allow("polygon"):
+        return None
+    if deadline is not None and _remaining(deadline) <= 0:
+        return None
+
+    multiplier, timespan, _ = INTERVALS[interval]
+    end_date = dt.datetime.utcnow()
+    window_start = (end_date - dt.timedelta(days=days)).date().isoformat()
+    fetch_from = bar_cache.fetch_start(ticker, interval, window_start)
+    url = (
+        f"{POLYGON_BASE_URL}/v2/aggs/ticker/{ticker}/range/{multiplier}/{timespan}/"
+        f"{_polygon_bound(fetch_from)}/{end_date.date()}?adjusted=true&sort=asc&limit=50000&apiKey={POLYGON_API_KEY}"
+    )
+
+    started = time.monotonic()
+    try:
+        r = http_get(url, timeout=_call_timeout(url, deadline), provider="polygon",
+                     max_wait=_remaining(deadline))
+        # 200 with no results (unsupported ticker, holiday) is a healthy provider
+        provider_health.record("polygon", r.status_code == 200, time.monotonic() - started)
+        if r.status_code != 200:
+            return None
+        data = r.json()
+        bars = [(_bar_ts(dt.datetime.utcfromtimestamp(bar["t"] / 1000), interval),
+                 bar.get("o"), bar.get("h"), bar.get("l"), bar["c"])
+                for bar in data.get("results") or []]
+        bar_cache.store_bars(ticker, interval, bars, fetch_from, source="Polygon")
+        return bar_cache.window_closes(ticker, interval, window_start)
+    except rate_limiter.BudgetExhausted as e:
+        # Our own quota guard, not a provider failure: just hand back a half-open probe slot
+        provider_health.release("polygon")
+        print(f"  ⏳ {e}")
+    except:
+        provider_health.record("polygon", False, time.monotonic() - started)
+    return None
+
+def _snapshot_ready(ticker, window_start):
+    """History is cached up to the last few sessions, so only the current bar is missing"""
+    newest = bar_cache.fetch_start(ticker, "1d", window_start)
+    cutoff = (dt.datetime.utcnow() - dt.timedelta(days=SNAPSHOT_MAX_GAP_DAYS)).date().isoformat()
+    return newest != window_start and newest >= cutoff
+
+def _snapshot_allowed():
+    global _snapshot_denied_until
+    if _snapshot_denied_until is None:
+        try:
+            with open(SNAPSHOT_STATE_FILE) as f:
+                _snapshot_denied_until = float(json.load(f).get("denied_until", 0))
+        except Exception:
+            _snapshot_denied_until = 0.0
+    return time.time() >= _snapshot_denied_until
+
+def _deny_snapshot():
+    """Record the plan's lack of snapshot access for every process sharing the cache directory"""
+    global _snapshot_denied_until
+    _snapshot_denied_until = time.time() + SNAPSHOT_RECHECK
+    try:
+        os.makedirs(bar_cache.CACHE_DIR, exist_ok=True)
+        tmp = SNAPSHOT_STATE_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"denied_until": _snapshot_denied_until}, f)
+        os.replace(tmp, SNAPSHOT_STATE_FILE)
+    except Exception as e:
+        print(f"⚠️ Failed to save Polygon snapshot state: {e}")
+
+def get_polygon_snapshot(tickers, days=7, deadline=None):
+    """
+    One Polygon universal-snapshot request for every ticker whose daily history is already cached
+    The current session's bar is upserted from the snapshot and the window served from the bar cache
+    - deadline: time.monotonic() value the call must finish by
+    Returns dict[ticker] -> (latest_close, oldest_close) for the tickers it answered
+    """
+    if not POLYGON_API_KEY or not tickers or not _snapshot_allowed() or not provider_health.allow("polygon"):
+        return {}
+
+    window_start = (dt.datetime.utcnow() - dt.timedelta(days=days)).date().isoformat()
+    ready = [t for t in tickers if _snapshot_ready(t, window_start)]
+    if not ready:
+        return {}
+    url = f"{POLYGON_BASE_URL}/v3/snapshot?ticker.any_of={','.join(ready)}&limit=250&apiKey={POLYGON_API_KEY}"
+
+    started = time.monotonic()
+    try:
+        r = http_get(url, timeout=_call_timeout(url, deadline), provider="polygon",
+                     max_wait=_remaining(deadline))
+        if r.status_code in (401, 403):
+            # Plan without snapshot access: stay on per-ticker aggregates until SNAPSHOT_RECHECK passes
+            _deny_snapshot()
+            print("  ℹ️ Polygon snapshot not available on this plan, using per-ticker aggregates")
+            return {}
+        provider_health.record("polygon", r.status_code == 200, time.monotonic() - started)
+        if r.status_code != 200:
+            return {}
+
+        out = {}
+        for item in r.json().get("results") or []:
+            ticker = item.get("ticker")
+            session = item.get("session") or {}
+            close = item.get("value") or session.get("close") or session.get("price")
+            if ticker not in ready or not close or item.get("error"):
+                continue
+            # last_updated is epoch nanoseconds; it dates the session (Friday's bar over a weekend)
+            updated = item.get("last_updated")
+            day = (dt.datetime.utcfromtimestamp(updated / 1e9) if updated else dt.datetime.utcnow()).date().isoformat()
+            bar_cache.store_bars(ticker, "1d", [(day, session.get("open"), session.get("high"), session.get("low"), close)],
+                                 day, source="Polygon")
+            window = bar_cache.window_closes(ticker, "1d", window_start)
+            if window:
+                out[ticker] = window
+        return out
+    except rate_limiter.BudgetExhausted as e:
+        # Our own quota guard, not a provider failure: just hand back a half-open probe slot
+        provider_health.release("polygon")
+        print(f"  ⏳ {e}")
+    except:
+        provider_health.record("polygon", False, time.monotonic() - started)
+    return {}
+
+def _frame_bars(df, ticker, interval="1d"):
+    """Split one ticker's OHLC rows out of a (multi-ticker) yfinance frame"""
+    if getattr(df.columns, "nlevels", 1) > 1:
+        df = df.xs(ticker, axis=1, level=1)
+    df = df.dropna(subset=["Close"])
+    index = df.index
+    if interval != "1d" and index.tz is not None:
+        index = index.tz_convert("UTC")
+    return [
+        (_bar_ts(ts, interval), float(o), float(h), float(l), float(c))
+        for ts, o, h, l, c in zip(index, df["Open"], df["High"], df["Low"], df["Close"])
+    ]
+
+def _refresh_yahoo(tickers, days=7, interval="1d", deadline=None):
+    """
+    Bring the bar cache up to date for `tickers` with one Yahoo Finance download
+    - deadline: time.monotonic() value the token wait and download must finish by
+    Returns the window start date (ISO) to read from the cache, or None if the download failed
+    """
+    end_date = dt.datetime.utcnow()
+    window_start = (end_date - dt.timedelta(days=days)).date().isoformat()
+    fetch_from = min(bar_cache.fetch_start(t, interval, window_start) for t in tickers)
+    if interval == "1d":
+        # Daily download stops before today's partial bar
+        end = end_date.date()
+        if fetch_from >= end.isoformat():
+            return window_start
+    else:
+        # Intraday includes the current session; Yahoo only takes whole days as bounds
+        end = end_date.date() + dt.timedelta(days=1)
+    if deadline is not None and _remaining(deadline) <= 0:
+        return None
+    if not provider_health.allow("yahoo"):
+        return None
+    try:
+        rate_limiter.acquire("yahoo", max_wait=_remaining(deadline))
+    except rate_limiter.BudgetExhausted as e:
+        provider_health.release("yahoo")
+        print(f"  ⏳ {e}")
+        return None
+
+    # Imported on first Yahoo fallback: yfinance pulls in pandas, which most Polygon runs never need
+    import yfinance as yf
+
+    # threads=False: yfinance requests the tickers one after another, so they share what's left
+    remaining = _remaining(deadline)
+    timeout = 10 if remaining is None else max(1.0, remaining / len(tickers))
+    started = time.monotonic()
+    try:
+        df = yf.download(list(tickers), start=fetch_from[:10], end=end, progress=False, timeout=timeout,
+                         interval=INTERVALS[interval][2], auto_adjust=True, group_by="column", threads=False)
+        provider_health.record("yahoo", True, time.monotonic() - started)
+        if df is not None and not df.empty:
+            for t in tickers:
+                bar_cache.store_bars(t, interval, _frame_bars(df, t, interval), fetch_from, source="Yahoo")
+        return window_start
+    except:
+        provider_health.record("yahoo", False, time.monotonic() - started)
+    return None
+
+def get_yahoo_price(ticker, days=7, interval="1d"):
+    """
+    Fetch closing prices using Yahoo Finance (via the bar cache)
+    Returns (latest_close, oldest_close) or None if unavailable
+    """
+    window_start = _refresh_yahoo([ticker], days, interval)
+    if window_start is None:
+        return None
+    return bar_cache.window_closes(ticker, interval, window_start)
+
+def get_yahoo_prices(tickers, days=7, interval="1d", deadline=None):
+    """
+    Fetch closes for several tickers in a single Yahoo Finance download
+    - deadline: time.monotonic() value the download must finish by
+    Returns dict[ticker] -> pct_change for every ticker with at least two cached closes
+    """
+    if not tickers:
+        return {}
+    window_start = _refresh_yahoo(list(tickers), days, interval, deadline)
+    if window_start is None:
+        return {}
+    windows = {t: bar_cache.window_closes(t, interval, window_start) for t in tickers}
+    return {t: round(((w[0] - w[1]) / w[1]) * 100, 2) for t, w in windows.items() if w}
+
+def get_percent_change_hybrid(polygon_ticker, yahoo_ticker, interval="1d"):
+    """
+    Try Polygon first, fallback to Yahoo Finance
+    Returns (pct_change, source_used)
+    """
+    # Try Polygon first
+    prices = get_polygon_price(polygon_ticker, interval=interval)
+    if prices:
+        latest, oldest = prices
+        pct = round(((latest - oldest) / oldest) * 100, 2)
+        return pct, "Polygon"
+
+    # Fallback to Yahoo Finance
+    prices = get_yahoo_price(yahoo_ticker, interval=interval)
+    if prices:
+        latest, oldest = prices
+        pct = round(((latest - oldest) / oldest) * 100, 2)
+        return pct, "Yahoo"
+
+    # Missing, not a 0% move
+    return None, "None"
+
+def get_percent_changes_hybrid(ticker_map, deadline=None, days=7, interval="1d"):
+    """
+    Batch version of get_percent_change_hybrid for a whole ticker map
+    - Daily mode: one Polygon snapshot request covers every ticker with cached history
+    - Polygon aggregates are tried for the rest concurrently until `deadline` minus YAHOO_RESERVE
+    - Every ticker Polygon didn't answer always goes into one Yahoo multi-ticker download
+    Returns dict[key] -> {"pct": float | None, "source": "Polygon"|"Yahoo"|"None"|"Timeout", "elapsed": seconds}
+    (pct is None when no provider answered)
+    """
+    deadline = FETCH_DEADLINE if deadline is None else deadline
+    started = time.monotonic()
+    # Polygon (snapshot + aggregates) must be done by here, leaving Yahoo its reserve
+    polygon_deadline = started + max(0.0, deadline - YAHOO_RESERVE)
+    out = {}
+
+    if POLYGON_API_KEY and interval == "1d":
+        snapshot = get_polygon_snapshot([p for p, _ in ticker_map.values()], days, deadline=polygon_deadline)
+        for key, (polygon_ticker, _) in ticker_map.items():
+            if polygon_ticker in snapshot:
+                latest, oldest = snapshot[polygon_ticker]
+                pct = round(((latest - oldest) / oldest) * 100, 2)
+                out[key] = {"pct": pct, "source": "Polygon", "elapsed": round(time.monotonic() - started, 2)}
+
+    pending = {key: p for key, (p, _) in ticker_map.items() if key not in out}
+    if POLYGON_API_KEY and pending:
+        pool = ThreadPoolExecutor(max_workers=len(pending), thread_name_prefix="market")
+        futures = {key: pool.submit(get_polygon_price, p, days, interval, polygon_deadline)
+                   for key, p in pending.items()}
+        wait(futures.values(), timeout=max(0.0, polygon_deadline - time.monotonic()))
+        # Don't block on stragglers: the run moves on, their threads finish in the background
+        pool.shutdown(wait=False, cancel_futures=True)
+        for key, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None and future.result():
+                latest, oldest = future.result()
+                pct = round(((latest - oldest) / oldest) * 100, 2)
+                out[key] = {"pct": pct, "source": "Polygon", "elapsed": round(time.monotonic() - started, 2)}
+
+    fallback = {key: y for key, (_, y) in ticker_map.items() if key not in out}
+    if fallback:
+        yahoo = get_yahoo_prices(list(fallback.values()), days, interval, deadline=started + deadline)
+        elapsed = round(time.monotonic() - started, 2)
+        for key, yahoo_ticker in fallback.items():
+            if yahoo_ticker in yahoo:
+                out[key] = {"pct": yahoo[yahoo_ticker], "source": "Yahoo", "elapsed": elapsed}
+
+    timed_out = time.monotonic() - started >= deadline
+    for key in ticker_map:
+        if key not in out:
+            out[key] = {"pct": None, "source": "Timeout" if timed_out else "None", "elapsed": round(time.monotonic() - started, 2)}
+    return out
+
+# ----------------- FETCH MODES -----------------
+def _timed_fetch(polygon_ticker, yahoo_ticker, interval="1d"):
+    started = time.monotonic()
+    pct_change, source = get_percent_change_hybrid(polygon_ticker, yahoo_ticker, interval)
+    return {"pct": pct_change, "source": source, "elapsed": round(time.monotonic() - started, 2)}
+
+def fetch_market_quotes(concurrent=True, deadline=None, interval="1d"):
+    """
+    Fetch every ticker in TICKER_MAP
+    Returns dict[key] -> {"pct": float | None, "source": "Polygon"|"Yahoo"|"None"|"Timeout", "elapsed": seconds}
+    - concurrent=True fans Polygon out across all tickers, batches the Yahoo
+      fallback into one download, and stops waiting after `deadline` seconds
+    - concurrent=False keeps the original one-ticker-at-a-time walk
+    - interval="1h"/"15m" measures the same 7-day window up to the newest intraday bar
+    """
+    if not concurrent:
+        quotes = {key: _timed_fetch(p, y, interval) for key, (p, y) in TICKER_MAP.items()}
+    else:
+        quotes = get_percent_changes_hybrid(TICKER_MAP, deadline=deadline, interval=interval)
+    provider_health.save()
+    return quotes
+
+# ----------------- MULTI-HORIZON RETURNS -----------------
+def fetch_returns(horizons=HORIZONS, deadline=None, window_days=7):
+    """
+    Pull one history per ticker (long enough for the largest horizon) and compute
+    every horizon's % return for all TICKER_MAP keys in one vectorized pass
+    Returns {
+        "keys": [key, ...],
+        "horizons": [h, ...],
+        "returns": np.ndarray (keys × horizons) of % changes, 0.0 where unavailable,
+        "valid": np.ndarray (keys × horizons) of bool,
+        "sources": {key: provider},
+        "quotes": fetch_market_quotes-style dict of the `window_days` first-to-last change,
+                  read from the same cached history (no extra requests),
+    }
+    """
+    horizons = list(horizons)
+    depth = max(horizons) + 1
+    # Calendar days that comfortably hold `depth` trading bars (weekends + holidays)
+    days = int(depth * 7 / 5) + 10
+    history = get_percent_changes_hybrid(TICKER_MAP, deadline=deadline, days=days)
+    provider_health.save()
+
+    keys = list(TICKER_MAP)
+    now = dt.datetime.utcnow()
+    start = (now - dt.timedelta(days=days)).date().isoformat()
+    window_start = (now - dt.timedelta(days=window_days)).date().isoformat()
+    closes = np.full((len(keys), depth), np.nan)
+    quotes = {}
+    for i, key in enumerate(keys):
+        source = history[key]["source"]
+        quotes[key] = {"pct": None, "source": source, "elapsed": history[key]["elapsed"]}
+        if source not in ("Polygon", "Yahoo"):
+            continue
+        ticker = TICKER_MAP[key][0 if source == "Polygon" else 1]
+        series = [c for _, c in bar_cache.load_closes(ticker, "1d", start)][-depth:]
+        if series:
+            closes[i, depth - len(series):] = series
+        window = bar_cache.window_closes(ticker, "1d", window_start)
+        if window:
+            latest, oldest = window
+            quotes[key]["pct"] = round(((latest - oldest) / oldest) * 100, 2)
+
+    # Right-aligned matrix: column -1 is the latest close, column -1-h the close h bars back
+    latest = closes[:, -1:]
+    lagged = closes[:, [-1 - h for h in horizons]]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        pct = np.round((latest / lagged - 1.0) * 100, 2)
+    valid = np.isfinite(pct)
+
+    return {
+        "keys": keys,
+        "horizons": horizons,
+        "returns": np.where(valid, pct, 0.0),
+        "valid": valid,
+        "sources": {key: history[key]["source"] for key in keys},
+        "quotes": quotes,
+    }
+
+def horizon_returns(table, horizon):
+    """Read one horizon out of a fetch_returns table as dict[key] -> pct_change (None where unavailable)"""
+    col = table["horizons"].index(horizon)
+    return {key: float(table["returns"][i, col]) if table["valid"][i, col] else None
+            for i, key in enumerate(table["keys"])}
+
+def print_quotes(quotes):
+    """One log line per ticker plus any provider whose circuit isn't closed"""
+    for key, q in quotes.items():
+        if q["source"] == "Timeout":
+            print(f"  ⏱️ {key}: Deadline hit, no data")
+        elif q["pct"] is not None:
+            print(f"  ✅ {key}: {q['pct']:+.2f}% ({q['source']}, {q['elapsed']}s)")
+        else:
+            print(f"  ⚠️ {key}: No data from either provider")
+    for provider, h in provider_health.health_report().items():
+        if h["state"] != provider_health.CLOSED:
+            print(f"  🔌 {provider}: circuit {h['state']} (success {h['success_rate']:.0%}, {h['latency_ms']:.0f}ms)")
+
+def fetch_markets(concurrent=True, deadline=None, verbose=False, horizon=None, interval="1d"):
+    """
+    Hybrid market data fetcher: tries Polygon.io first, falls back to Yahoo Finance
+    Returns dict[key] -> pct_change for all 7 critical metrics (None where no provider answered)
+    - horizon=None keeps the 7-calendar-day first-to-last change
+    - horizon=N reads the N-trading-day return from the shared fetch_returns table
+    - interval="1h"/"15m" ends the window on the newest intraday bar (ignored with horizon)
+    """
+    if verbose:
+        print("\n📊 Fetching market data (Polygon → Yahoo fallback)...")
+
+    if horizon is None:
+        quotes = fetch_market_quotes(concurrent=concurrent, deadline=deadline, interval=interval)
+    else:
+        started = time.monotonic()
+        horizons = sorted(set(HORIZONS) | {horizon})
+        table = fetch_returns(horizons=horizons, deadline=deadline)
+        elapsed = round(time.monotonic() - started, 2)
+        quotes = {
+            key: {"pct": pct, "source": table["sources"][key], "elapsed": elapsed}
+            for key, pct in horizon_returns(table, horizon).items()
+        }
+
+    if verbose:
+        print_quotes(quotes)
+
+    return {key: q["pct"] for key, q in quotes.items()}
+
+if __name__ == "__main__":
+    started = time.monotonic()
+    fetch_markets(verbose=True)
+    print(f"\n⏱️ Fetched in {time.monotonic() - started:.1f}s")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Shared DXY/WTI/GOLD/COPPER/SPX/UST10Y/VIX snapshot for every bias job
+- Stale-while-revalidate: callers get the last snapshot immediately
+- Once the TTL has passed, a background refresh updates it for the next caller
+- Snapshots older than MAX_STALE (or missing) are fetched synchronously
+- Persisted in the cache directory so weekly, 30-min and high-impact runs share it
+- A ticker no provider answered keeps its last good value (as_of records when it was fetched)
+- The daily snapshot also holds the 1/5/20/60-day returns table, so each engine reads
+  the horizon it needs from the same fetch
+"""
+import os, json, time, threading
+from bar_cache import CACHE_DIR
+from market_data import fetch_market_quotes, fetch_returns, print_quotes
+
+# ----------------- CONFIG -----------------
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, "market_snapshot.json")
+LOCK_FILE = SNAPSHOT_FILE + ".lock"
+
+SNAPSHOT_TTL = float(os.getenv("MARKET_SNAPSHOT_TTL", str(15 * 60)))
+MAX_STALE = float(os.getenv("MARKET_SNAPSHOT_MAX_STALE", str(6 * 3600)))
+LOCK_TIMEOUT = 120           # a refresh lock older than this is treated as abandoned
+
+_lock = threading.Lock()
+_refreshing = set()
+
+# ----------------- STORAGE -----------------
+def _load():
+    try:
+        with open(SNAPSHOT_FILE) as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _returns_doc(table):
+    """fetch_returns table → {"horizons": [h, ...], "values": {key: [pct | None per horizon]}}"""
+    return {
+        "horizons": table["horizons"],
+        "values": {key: [float(table["returns"][i, j]) if table["valid"][i, j] else None
+                         for j in range(len(table["horizons"]))]
+                   for i, key in enumerate(table["keys"])},
+    }
+
+def _save(interval, quotes, returns=None):
+    with _lock:
+        snapshots = _load()
+        now = time.time()
+        prev = snapshots.get(interval) or {}
+        prev_returns = prev.get("returns")
+        if returns and prev_returns and prev_returns["horizons"] != returns["horizons"]:
+            prev_returns = None
+        markets, sources, as_of = {}, {}, {}
+        for key, q in quotes.items():
+            last_good = prev.get("as_of", {}).get(key, prev.get("fetched_at", 0))
+            if (q["pct"] is None and prev.get("markets", {}).get(key) is not None
+                    and now - last_good <= MAX_STALE):
+                # Failed/timed-out fetch: carry the last good value forward
+                markets[key], sources[key], as_of[key] = prev["markets"][key], prev["sources"][key], last_good
+                if returns and prev_returns and key in prev_returns["values"]:
+                    returns["values"][key] = prev_returns["values"][key]
+            else:
+                markets[key], sources[key], as_of[key] = q["pct"], q["source"], now
+        snapshots[interval] = {"fetched_at": now, "markets": markets, "sources": sources, "as_of": as_of}
+        if returns:
+            snapshots[interval]["returns"] = returns
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp = SNAPSHOT_FILE + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(snapshots, f, indent=2)
+            os.replace(tmp, SNAPSHOT_FILE)
+        except Exception as e:
+            print(f"⚠️ Failed to save market snapshot: {e}")
+    return snapshots[interval]
+
+def _acquire_refresh_lock():
+    """Cross-process guard so overlapping cron jobs don't refresh at the same time"""
+    try:
+        if time.time() - os.path.getmtime(LOCK_FILE) > LOCK_TIMEOUT:
+            os.remove(LOCK_FILE)
+    except OSError:
+        pass
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        os.close(os.open(LOCK_FILE, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        return True
+    except OSError:
+        return False
+
+def _release_refresh_lock():
+    try:
+        os.remove(LOCK_FILE)
+    except OSError:
+        pass
+
+# ----------------- REFRESH -----------------
+def refresh_snapshot(interval="1d", verbose=False):
+    """
+    Fetch every ticker now and store the result as the latest snapshot
+    Daily snapshots come from one fetch_returns history (window change + horizon table)
+    """
+    returns = None
+    if interval == "1d":
+        table = fetch_returns()
+        quotes, returns = table["quotes"], _returns_doc(table)
+    else:
+        quotes = fetch_market_quotes(interval=interval)
+    if verbose:
+        print_quotes(quotes)
+    return _save(interval, quotes, returns)
+
+def _background_refresh(interval):
+    try:
+        refresh_snapshot(interval)
+    except Exception as e:
+        print(f"⚠️ Background market refresh failed: {e}")
+    finally:
+        _release_refresh_lock()
+        with _lock:
+            _refreshing.discard(interval)
+
+def _revalidate(interval):
+    with _lock:
+        if interval in _refreshing:
+            return
+        _refreshing.add(interval)
+    if not _acquire_refresh_lock():
+        with _lock:
+            _refreshing.discard(interval)
+        return
+    # Non-daemon: a cron process finishes the refresh before exiting so the next job finds it
+    threading.Thread(target=_background_refresh, args=(interval,), name="market-revalidate").start()
+
+def _has_horizon(snap, horizon):
+    return horizon is None or horizon in (snap.get("returns") or {}).get("horizons", [])
+
+def _markets(snap, horizon=None):
+    """dict[key] -> pct_change: the window change, or one horizon of the returns table"""
+    if horizon is None:
+        return dict(snap["markets"])
+    returns = snap["returns"]
+    col = returns["horizons"].index(horizon)
+    return {key: row[col] for key, row in returns["values"].items()}
+
+def get_market_snapshot(interval="1d", ttl=None, max_stale=None, verbose=False, horizon=None):
+    """
+    Return dict[key] -> pct_change for the shared market snapshot
+    - horizon=N (one of market_data.HORIZONS; daily snapshot only) reads the N-trading-day
+      return from the returns table;
+      None keeps the 7-day window change
+    - age <= ttl → cached snapshot, no fetch
+    - ttl < age <= max_stale → cached snapshot now, refresh in the background
+    - missing, older than max_stale or without the horizon → synchronous fetch
+    """
+    ttl = SNAPSHOT_TTL if ttl is None else ttl
+    max_stale = MAX_STALE if max_stale is None else max_stale
+    horizon = horizon if interval == "1d" else None
+
+    snap = _load().get(interval)
+    age = time.time() - snap["fetched_at"] if snap else None
+
+    if snap is None or age > max_stale or not _has_horizon(snap, horizon):
+        if verbose:
+            print("\n📊 Fetching market data (Polygon → Yahoo fallback)...")
+        return _markets(refresh_snapshot(interval, verbose=verbose), horizon)
+
+    if verbose:
+        print(f"\n📊 Using market snapshot from {int(age // 60)} min ago"
+              + (" (refreshing in background)" if age > ttl else ""))
+    if age > ttl:
+        _revalidate(interval)
+    return _markets(snap, horizon)
+
+if __name__ == "__main__":
+    started = time.monotonic()
+    print(get_market_snapshot(verbose=True))
+    print(f"\n⏱️ Snapshot served in {time.monotonic() - started:.2f}s")
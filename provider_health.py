@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Provider health tracking + circuit breaker for the market data hybrid
+- Keeps recent success rate and latency per provider (EWMA)
+- Opens the circuit after repeated failures so callers skip straight to the fallback
+- Probes the failing provider again on a half-open schedule (cooldown doubles per failed probe)
+- State persists between runs in the cache directory
+"""
+import os, json, time, threading
+from bar_cache import CACHE_DIR
+
+# ----------------- CONFIG -----------------
+HEALTH_FILE = os.path.join(CACHE_DIR, "provider_health.json")
+
+FAILURE_THRESHOLD = 3        # consecutive failures that open the circuit
+MIN_SUCCESS_RATE = 0.5       # ...or success rate below this once MIN_SAMPLES are in
+MIN_SAMPLES = 5
+BASE_COOLDOWN = float(os.getenv("PROVIDER_COOLDOWN", "60"))
+MAX_COOLDOWN = 30 * 60
+PROBE_TIMEOUT = 60           # a probe that never reported back frees the slot after this
+EWMA_ALPHA = 0.3
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+_lock = threading.Lock()
+_state = None
+
+def _new_entry():
+    return {
+        "state": CLOSED,
+        "success_rate": 1.0,
+        "latency_ms": 0.0,
+        "samples": 0,
+        "consecutive_failures": 0,
+        "opened_at": 0.0,
+        "cooldown": BASE_COOLDOWN,
+        "probe_started": 0.0,
+    }
+
+def _load():
+    global _state
+    if _state is None:
+        try:
+            with open(HEALTH_FILE) as f:
+                _state = json.load(f)
+        except Exception:
+            _state = {}
+    return _state
+
+def _entry(provider):
+    state = _load()
+    if provider not in state:
+        state[provider] = _new_entry()
+    return state[provider]
+
+# ----------------- BREAKER -----------------
+def allow(provider):
+    """
+    Should a call to `provider` be attempted right now?
+    - closed → yes
+    - open → no, until the cooldown has passed; then one half-open probe is let through
+    - half_open → no while the probe is in flight
+    """
+    now = time.time()
+    with _lock:
+        e = _entry(provider)
+        if e["state"] == CLOSED:
+            return True
+        if e["state"] == OPEN and now - e["opened_at"] >= e["cooldown"]:
+            e["state"] = HALF_OPEN
+            e["probe_started"] = now
+            return True
+        if e["state"] == HALF_OPEN and now - e["probe_started"] >= PROBE_TIMEOUT:
+            e["probe_started"] = now
+            return True
+        return False
+
+def record(provider, ok, latency):
+    """Report the outcome of one call (latency in seconds)"""
+    now = time.time()
+    with _lock:
+        e = _entry(provider)
+        e["samples"] += 1
+        e["success_rate"] = round((1 - EWMA_ALPHA) * e["success_rate"] + EWMA_ALPHA * (1.0 if ok else 0.0), 4)
+        e["latency_ms"] = round((1 - EWMA_ALPHA) * e["latency_ms"] + EWMA_ALPHA * latency * 1000, 1)
+
+        if ok:
+            e["consecutive_failures"] = 0
+            if e["state"] != CLOSED:
+                print(f"  🟢 {provider}: circuit closed (probe succeeded)")
+            e["state"] = CLOSED
+            e["cooldown"] = BASE_COOLDOWN
+            return
+
+        e["consecutive_failures"] += 1
+        if e["state"] == HALF_OPEN:
+            e["state"] = OPEN
+            e["opened_at"] = now
+            e["cooldown"] = min(e["cooldown"] * 2, MAX_COOLDOWN)
+            print(f"  🔴 {provider}: probe failed, retry in {int(e['cooldown'])}s")
+        elif e["state"] == CLOSED and (
+            e["consecutive_failures"] >= FAILURE_THRESHOLD
+            or (e["samples"] >= MIN_SAMPLES and e["success_rate"] < MIN_SUCCESS_RATE)
+        ):
+            e["state"] = OPEN
+            e["opened_at"] = now
+            print(f"  🔴 {provider}: circuit opened ({e['consecutive_failures']} failures, "
+                  f"success {e['success_rate']:.0%}), skipping for {int(e['cooldown'])}s")
+
+def release(provider):
+    """
+    A call that allow() let through was skipped before reaching the provider (e.g. our own
+    quota guard): free a half-open probe slot without counting a failure or doubling the
+    cooldown, so the next call probes again
+    """
+    with _lock:
+        e = _entry(provider)
+        if e["state"] == HALF_OPEN:
+            e["state"] = OPEN
+
+def save():
+    """Persist health state so the next run starts from what this one learned"""
+    with _lock:
+        state = json.loads(json.dumps(_load()))
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = HEALTH_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, HEALTH_FILE)
+    except Exception as e:
+        print(f"⚠️ Failed to save provider health: {e}")
+
+def health_report():
+    """Return dict[provider] -> {state, success_rate, latency_ms, ...}"""
+    with _lock:
+        return json.loads(json.dumps(_load()))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Change-only publishing for fundamental_bias / index_bias
+- Keeps a fingerprint of the last-published row per (table, key)
+- Rows whose content (minus updated_at) is unchanged are skipped
+- Fingerprints older than REPUBLISH_AFTER are dropped so rows still get a periodic refresh
+- State persists between runs in the cache directory
+"""
+import os, json, time, hashlib, threading
+from bar_cache import CACHE_DIR
+
+# ----------------- CONFIG -----------------
+STATE_FILE = os.path.join(CACHE_DIR, "published_rows.json")
+
+# Columns that change every run without the row changing
+VOLATILE_COLUMNS = ("updated_at",)
+REPUBLISH_AFTER = float(os.getenv("PUBLISH_REFRESH_SECONDS", str(24 * 3600)))
+
+_lock = threading.Lock()
+_state = None
+
+def _load():
+    global _state
+    if _state is None:
+        try:
+            with open(STATE_FILE) as f:
+                _state = json.load(f)
+        except Exception:
+            _state = {}
+    return _state
+
+def _save():
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = STATE_FILE + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(_state, f)
+        os.replace(tmp, STATE_FILE)
+    except Exception as e:
+        print(f"⚠️ Failed to save publish state: {e}")
+
+# ----------------- FINGERPRINTS -----------------
+def fingerprint(row):
+    """Stable hash of a row's content, ignoring VOLATILE_COLUMNS"""
+    content = {k: v for k, v in row.items() if k not in VOLATILE_COLUMNS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+def changed_rows(table, key, rows):
+    """
+    Split rows into (changed, skipped_count) against the last-published fingerprints
+    - key: the upsert conflict column ("pair", "instrument")
+    """
+    now = time.time()
+    with _lock:
+        published = _load().get(table, {})
+        changed = []
+        for row in rows:
+            last = published.get(str(row[key]))
+            if last and last["fp"] == fingerprint(row) and now - last["at"] < REPUBLISH_AFTER:
+                continue
+            changed.append(row)
+    return changed, len(rows) - len(changed)
+
+def mark_published(table, key, rows):
+    """Record rows as published; call only after the write succeeded"""
+    if not rows:
+        return
+    now = time.time()
+    with _lock:
+        published = _load().setdefault(table, {})
+        for row in rows:
+            published[str(row[key])] = {"fp": fingerprint(row), "at": now}
+        _save()
+
+def forget(table=None):
+    """Drop fingerprints (one table or all) so the next run republishes everything"""
+    with _lock:
+        state = _load()
+        if table is None:
+            state.clear()
+        else:
+            state.pop(table, None)
+        _save()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Token-bucket rate limiting + per-run request budgets for external APIs
+- One bucket per provider (Polygon, EconDB, TradingEconomics, Forex Factory, Yahoo)
+- Buckets live in a SQLite file so overlapping cron jobs draw from the same quota
+- Priority scheduling: high-impact recalcs go first in-process, and lower priorities
+  leave a reserve of tokens untouched so a high-impact job in another process still gets through
+- End-of-run budget report
+"""
+import os, time, sqlite3, threading, itertools, heapq, contextvars
+from contextlib import contextmanager
+from bar_cache import CACHE_DIR
+
+# ----------------- CONFIG -----------------
+LIMIT_DB = os.path.join(CACHE_DIR, "rate_limits.sqlite3")
+
+# provider -> (capacity, period seconds); override with RATE_LIMIT_<PROVIDER>="capacity/period"
+DEFAULT_LIMITS = {
+    "polygon": (5, 60),            # free tier: 5 requests / minute
+    "econdb": (60, 60),
+    "tradingeconomics": (30, 60),
+    "forexfactory": (4, 60),
+    "yahoo": (30, 60),
+}
+
+# provider -> max requests per run; override with REQUEST_BUDGET_<PROVIDER>, unset = unlimited
+DEFAULT_BUDGETS = {
+    "polygon": 20,
+    "econdb": 30,
+}
+
+HIGH, NORMAL, LOW = 0, 5, 10
+PRIORITY_NAMES = {"high": HIGH, "normal": NORMAL, "low": LOW}
+# Tokens a caller must leave in the bucket, by priority
+RESERVE = {HIGH: 0, NORMAL: 1, LOW: 2}
+
+MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))
+
+_run_priority = PRIORITY_NAMES.get(os.getenv("RATE_LIMIT_PRIORITY", "normal").lower(), NORMAL)
+_priority_var = contextvars.ContextVar("rate_limit_priority", default=None)
+
+_lock = threading.Lock()
+_local = threading.local()
+_seq = itertools.count()
+_buckets = {}
+_stats = {}
+
+class BudgetExhausted(Exception):
+    """Raised when a provider's per-run budget or the max wait for a token is used up"""
+
+def _limit(provider):
+    env = os.getenv(f"RATE_LIMIT_{provider.upper()}")
+    if env:
+        capacity, _, period = env.partition("/")
+        return float(capacity), float(period or 60)
+    return DEFAULT_LIMITS.get(provider, (60, 60))
+
+def _budget(provider):
+    env = os.getenv(f"REQUEST_BUDGET_{provider.upper()}")
+    if env:
+        return int(env) if int(env) > 0 else None
+    return DEFAULT_BUDGETS.get(provider)
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(LIMIT_DB, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (provider TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        _local.conn = conn
+    return conn
+
+# ----------------- PRIORITY -----------------
+def set_run_priority(priority):
+    """Default priority for every request this process makes (e.g. HIGH for high-impact recalcs)"""
+    global _run_priority
+    _run_priority = PRIORITY_NAMES.get(priority, priority) if isinstance(priority, str) else priority
+
+@contextmanager
+def priority(level):
+    """Temporarily override the priority for requests made in this context"""
+    token = _priority_var.set(PRIORITY_NAMES.get(level, level) if isinstance(level, str) else level)
+    try:
+        yield
+    finally:
+        _priority_var.reset(token)
+
+def current_priority():
+    level = _priority_var.get()
+    return _run_priority if level is None else level
+
+# ----------------- BUCKETS -----------------
+def _take(provider, reserve):
+    """
+    Atomically take one token from the shared bucket
+    Returns 0 on success, else seconds until enough tokens will be there
+    """
+    capacity, period = _limit(provider)
+    rate = capacity / period
+    reserve = min(reserve, capacity - 1)
+    conn = _conn()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE provider=?", (provider,)).fetchone()
+        tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+        if tokens >= 1 + reserve:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 + reserve - tokens) / rate
+        conn.execute(
+            "INSERT OR REPLACE INTO buckets (provider, tokens, updated) VALUES (?, ?, ?)",
+            (provider, tokens, now),
+        )
+        conn.execute("COMMIT")
+        return wait
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _entry(provider):
+    with _lock:
+        if provider not in _buckets:
+            _buckets[provider] = {"cond": threading.Condition(), "waiters": []}
+            _stats[provider] = {"granted": 0, "denied": 0, "waited": 0.0}
+        return _buckets[provider], _stats[provider]
+
+def acquire(provider, level=None, max_wait=None):
+    """
+    Block until `provider` may be called, highest priority first
+    Raises BudgetExhausted if the per-run budget is spent or no token comes within max_wait
+    """
+    level = current_priority() if level is None else level
+    max_wait = MAX_WAIT if max_wait is None else max_wait
+    bucket, stats = _entry(provider)
+    budget = _budget(provider)
+    started = time.monotonic()
+
+    with bucket["cond"]:
+        if budget is not None and stats["granted"] >= budget:
+            stats["denied"] += 1
+            raise BudgetExhausted(f"{provider}: run budget of {budget} requests used")
+
+        ticket = (level, next(_seq))
+        heapq.heappush(bucket["waiters"], ticket)
+        try:
+            while True:
+                wait = None
+                if bucket["waiters"][0] == ticket:
+                    wait = _take(provider, RESERVE.get(level, RESERVE[NORMAL]))
+                    if wait == 0:
+                        stats["granted"] += 1
+                        stats["waited"] += time.monotonic() - started
+                        return
+                remaining = max_wait - (time.monotonic() - started)
+                # Fail fast when the next token can't arrive in time, so the caller falls back now
+                if remaining <= 0 or (wait is not None and wait > remaining):
+                    stats["denied"] += 1
+                    raise BudgetExhausted(f"{provider}: no token within {max_wait:.0f}s")
+                bucket["cond"].wait(min(wait or 1.0, remaining))
+        finally:
+            bucket["waiters"].remove(ticket)
+            heapq.heapify(bucket["waiters"])
+            bucket["cond"].notify_all()
+
+# ----------------- REPORTING -----------------
+def budget_report(reset=True):
+    """Print and return per-provider usage for this run"""
+    with _lock:
+        report = {p: dict(s) for p, s in _stats.items()}
+        if reset:
+            for s in _stats.values():
+                s.update(granted=0, denied=0, waited=0.0)
+    if not report:
+        return report
+
+    print("📒 API budget this run:")
+    for provider, s in sorted(report.items()):
+        budget = _budget(provider)
+        capacity, period = _limit(provider)
+        left = f"{budget - s['granted']}/{budget} left" if budget is not None else "no run budget"
+        print(f"  {provider}: {s['granted']} calls, {s['denied']} denied, "
+              f"{s['waited']:.1f}s waiting, {left} (limit {capacity:g}/{period:g}s)")
+    return report
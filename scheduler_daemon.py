@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Long-running scheduler for every bias job (replaces the separate cron invocations)
+- One process runs the high-impact check, FF full refresh, 30-min/hourly bias refresh,
+  weekly bias run and daily compaction on their usual cron schedules
+- Stays warm between cycles: pooled HTTP sessions, bar cache / market snapshot, provider
+  health, publish fingerprints, the parsed FF calendar and processed-event IDs
+- Jobs run one at a time, highest priority first when several are due; missed slots coalesce
+- GET /health (and /status) on DAEMON_PORT returns job and spool status as JSON
+"""
+import os, sys, json, time, signal, threading, traceback
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import rate_limiter
+import provider_health
+import write_spool
+
+# ----------------- CONFIG -----------------
+DAEMON_HOST = os.getenv("DAEMON_HOST", "0.0.0.0")
+DAEMON_PORT = int(os.getenv("DAEMON_PORT", "8080"))
+# /health reports 503 if the idle scheduler loop hasn't ticked for this long,
+# or if the running job has overrun its own max runtime (JOBS)
+HEARTBEAT_TIMEOUT = 120
+TICK = 30                    # max seconds between schedule checks
+
+# ----------------- CRON -----------------
+def _field(spec, low, high):
+    """Values matched by one cron field: *, */n, a-b, a-b/n, lists"""
+    values = set()
+    for part in spec.split(","):
+        rng, _, step = part.partition("/")
+        if rng == "*":
+            start, end = low, high
+        elif "-" in rng:
+            start, end = (int(v) for v in rng.split("-"))
+        else:
+            start = end = int(rng)
+        values.update(range(start, end + 1, int(step or 1)))
+    return values
+
+def parse_cron(expr):
+    """'m h dom mon dow' → matcher(datetime); dow 0 = Sunday"""
+    minute, hour, dom, month, dow = expr.split()
+    fields = (_field(minute, 0, 59), _field(hour, 0, 23), _field(dom, 1, 31),
+              _field(month, 1, 12), {d % 7 for d in _field(dow, 0, 7)})
+    dom_any, dow_any = dom == "*", dow == "*"
+
+    def matches(ts):
+        day_ok = ts.day in fields[2]
+        dow_ok = (ts.weekday() + 1) % 7 in fields[4]
+        # Cron rule: when both day fields are restricted, either may match
+        days = day_ok and dow_ok if dom_any or dow_any else day_ok or dow_ok
+        return ts.minute in fields[0] and ts.hour in fields[1] and ts.month in fields[3] and days
+    return matches
+
+def next_match(matchers, after):
+    """First whole minute strictly after `after` that any matcher accepts"""
+    ts = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    for _ in range(366 * 24 * 60):
+        if any(m(ts) for m in matchers):
+            return ts
+        ts += timedelta(minutes=1)
+    return None
+
+# ----------------- JOBS -----------------
+def _high_impact_check():
+    import ff_high_impact_check
+    return ff_high_impact_check.run()
+
+def _ff_full_refresh():
+    import ff_full_refresh
+    return ff_full_refresh.run()
+
+def _hourly_update():
+    import hourly_update
+    with rate_limiter.priority("normal"):
+        hourly_update.run()
+
+def _weekly_bias():
+    import main
+    with rate_limiter.priority("normal"):
+        main.run()
+
+def _compaction():
+    import compact_currency_scores
+    return compact_currency_scores.run()
+
+# (name, cron expressions, fn, max runtime in seconds) in priority order
+JOBS = [
+    ("ff_high_impact_check", ["*/15 * * * *"], _high_impact_check, 10 * 60),
+    ("weekly_bias", ["0 0 * * 0"], _weekly_bias, 60 * 60),
+    ("hourly_update", ["*/30 6-22 * * 1-5", "0 * * * *"], _hourly_update, 20 * 60),
+    ("ff_full_refresh", ["0 */4 * * *"], _ff_full_refresh, 15 * 60),
+    ("compaction", ["0 3 * * *"], _compaction, 60 * 60),
+]
+
+class Scheduler:
+    def __init__(self, jobs=JOBS):
+        now = datetime.now(timezone.utc)
+        self.started = time.time()
+        self.heartbeat = time.time()
+        self.stop = threading.Event()
+        self.running = None
+        self.job_started = None
+        self.jobs = []
+        for name, crons, fn, max_runtime in jobs:
+            matchers = [parse_cron(c) for c in crons]
+            self.jobs.append({
+                "name": name, "crons": crons, "fn": fn, "matchers": matchers, "max_runtime": max_runtime,
+                "next_run": next_match(matchers, now),
+                "runs": 0, "failures": 0, "last_run": None, "last_duration": None,
+                "last_status": None, "last_error": None,
+            })
+
+    def _run(self, job):
+        self.job_started = time.time()
+        self.running = job
+        started = time.monotonic()
+        job["last_run"] = datetime.now(timezone.utc).isoformat()
+        try:
+            job["fn"]()
+            job["last_status"] = "ok"
+            job["last_error"] = None
+        except Exception as e:
+            job["failures"] += 1
+            job["last_status"] = "error"
+            job["last_error"] = f"{type(e).__name__}: {e}"
+            traceback.print_exc()
+        finally:
+            job["runs"] += 1
+            job["last_duration"] = round(time.monotonic() - started, 2)
+            self.heartbeat = time.time()
+            self.running = None
+            # Coalesce: slots missed while this (or an earlier) job ran are skipped
+            job["next_run"] = next_match(job["matchers"], datetime.now(timezone.utc))
+            print(f"[{datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC] "
+                  f"⏱️ {job['name']}: {job['last_status']} in {job['last_duration']}s, "
+                  f"next {job['next_run']:%Y-%m-%d %H:%M} UTC")
+
+    def run_forever(self):
+        while not self.stop.is_set():
+            self.heartbeat = time.time()
+            now = datetime.now(timezone.utc)
+            due = [job for job in self.jobs if job["next_run"] and job["next_run"] <= now]
+            for job in due:
+                if self.stop.is_set():
+                    break
+                self._run(job)
+            if due:
+                continue
+            upcoming = min((j["next_run"] for j in self.jobs if j["next_run"]), default=None)
+            wait = TICK if upcoming is None else (upcoming - now).total_seconds()
+            self.stop.wait(max(0.5, min(TICK, wait)))
+
+    def _healthy(self):
+        """A running job is healthy until it overruns its max runtime; an idle loop must keep ticking"""
+        job, started = self.running, self.job_started
+        if job is not None:
+            return time.time() - started <= job["max_runtime"]
+        return time.time() - self.heartbeat < HEARTBEAT_TIMEOUT
+
+    def status(self):
+        job, started = self.running, self.job_started
+        return {
+            "status": "ok" if self._healthy() else "stalled",
+            "uptime": round(time.time() - self.started),
+            "running": job["name"] if job else None,
+            "running_for": round(time.time() - started) if job else None,
+            "jobs": {job["name"]: {
+                "schedule": job["crons"],
+                "max_runtime": job["max_runtime"],
+                "next_run": job["next_run"].isoformat() if job["next_run"] else None,
+                **{k: job[k] for k in ("runs", "failures", "last_run", "last_duration",
+                                       "last_status", "last_error")},
+            } for job in self.jobs},
+            "spool": write_spool.pending(),
+            "providers": {p: {k: h[k] for k in ("state", "success_rate", "latency_ms")}
+                          for p, h in provider_health.health_report().items()},
+        }
+
+# ----------------- HEALTH ENDPOINT -----------------
+def make_handler(scheduler):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("/health", "/status"):
+                self.send_error(404)
+                return
+            try:
+                status = scheduler.status()
+                code = 200 if status["status"] == "ok" else 503
+            except Exception as e:
+                status, code = {"status": "error", "error": str(e)}, 500
+            body = json.dumps(status, default=str).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # keep job logs readable
+    return Handler
+
+def main():
+    scheduler = Scheduler()
+    server = ThreadingHTTPServer((DAEMON_HOST, DAEMON_PORT), make_handler(scheduler))
+    threading.Thread(target=server.serve_forever, name="health-http", daemon=True).start()
+
+    def shutdown(signum, frame):
+        print(f"Received signal {signum}, stopping after the current job...")
+        scheduler.stop.set()
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"🕒 Scheduler daemon up; health on http://{DAEMON_HOST}:{DAEMON_PORT}/health")
+    for job in scheduler.jobs:
+        print(f"  {job['name']}: {', '.join(job['crons'])} (next {job['next_run']:%Y-%m-%d %H:%M} UTC)")
+
+    if "--run-now" in sys.argv:
+        # Warm everything up with a full cycle instead of waiting for the first slot
+        for job in scheduler.jobs:
+            if job["name"] in ("ff_full_refresh", "hourly_update"):
+                scheduler._run(job)
+
+    scheduler.run_forever()
+
+    server.shutdown()
+    provider_health.save()
+    write_spool.wait(write_spool.FLUSH_DEADLINE)
+    print("Scheduler daemon stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Declarative market rules for currencies and indices
+- Each rule: (input, op, threshold, target, weight, component, note)
+- Rule tables compile once into NumPy threshold / weight matrices
+- One vectorized pass scores every target; notes come from the same table
+- Input → currency → pair/index dependency graph for incremental rescoring
+"""
+import numpy as np
+
+# ----------------- WEIGHTS -----------------
+W_COMMODITY = 2
+W_MARKET = 2
+
+# ----------------- INPUTS -----------------
+# Market moves (% change) fed to every target
+MARKET_INPUTS = ["DXY", "WTI", "GOLD", "COPPER", "SPX", "UST10Y", "VIX"]
+# Per-target input: the total score of an index's home currency
+HOME_CCY = "HOME_CCY"
+ALL = "*"
+
+# ----------------- RULE TABLES -----------------
+# (input, op, threshold, target, weight, component, note)
+# Order matters: a target's notes are listed in rule order
+CURRENCY_RULES = [
+    # Commodity links
+    ("WTI",    ">=",  1.0,  "CAD", +W_COMMODITY, "commodity", "Oil↑ → CAD+"),
+    ("WTI",    "<=", -1.0,  "CAD", -W_COMMODITY, "commodity", "Oil↓ → CAD-"),
+    ("COPPER", ">=",  1.0,  "AUD", +1,           "commodity", "Copper↑ → AUD+"),
+    ("COPPER", "<=", -1.0,  "AUD", -1,           "commodity", "Copper↓ → AUD-"),
+    ("GOLD",   ">=",  1.0,  "AUD", +1,           "commodity", "Gold↑ → AUD+"),
+    ("GOLD",   "<=", -1.0,  "AUD", -1,           "commodity", "Gold↓ → AUD-"),
+    ("SPX",    ">=",  1.0,  "NZD", +1,           "commodity", "Risk-on → NZD+"),
+    ("SPX",    "<=", -1.0,  "NZD", -1,           "commodity", "Risk-off → NZD-"),
+
+    # Precious metals
+    ("UST10Y", "<=", -0.05, "XAU", +2,           "commodity", "Yields↓ → Gold+"),
+    ("UST10Y", ">=",  0.05, "XAU", -2,           "commodity", "Yields↑ → Gold-"),
+    ("DXY",    "<=", -1.0,  "XAU", +2,           "commodity", "DXY↓ → Gold+"),
+    ("DXY",    ">=",  1.0,  "XAU", -2,           "commodity", "DXY↑ → Gold-"),
+    ("DXY",    "<=", -1.0,  "XAG", +1,           "commodity", "DXY↓ → Silver+"),
+    ("DXY",    ">=",  1.0,  "XAG", -1,           "commodity", "DXY↑ → Silver-"),
+    ("COPPER", ">=",  1.0,  "XAG", +1,           "commodity", "Copper↑ → Silver+ (industrial)"),
+    ("COPPER", "<=", -1.0,  "XAG", -1,           "commodity", "Copper↓ → Silver-"),
+
+    # Market flows
+    ("DXY",    ">=",  1.0,  "USD", +W_MARKET,    "market",    "DXY↑ → USD+"),
+    ("UST10Y", ">=",  0.05, "USD", +W_MARKET,    "market",    "Yields↑ → USD+"),
+    ("SPX",    "<=", -1.0,  "JPY", +W_MARKET,    "market",    "Risk-off → JPY/CHF+"),
+    ("SPX",    ">=",  1.0,  "JPY", -W_MARKET,    "market",    "Risk-on → JPY/CHF-"),
+    ("SPX",    "<=", -1.0,  "CHF", +W_MARKET,    "market",    "Risk-off → JPY/CHF+"),
+    ("SPX",    ">=",  1.0,  "CHF", -W_MARKET,    "market",    "Risk-on → JPY/CHF-"),
+]
+
+INDEX_RULES = [
+    # 1) Risk-on/off
+    ("SPX",    ">=",  1.0,  ALL,      +2, "index", "Risk-on (SPX↑)"),
+    ("SPX",    "<=", -1.0,  ALL,      -2, "index", "Risk-off (SPX↓)"),
+    ("VIX",    "<=", -10,   ALL,      +1, "index", "Vol↓"),
+    ("VIX",    ">=",  10,   ALL,      -1, "index", "Vol↑"),
+
+    # 2) Yields
+    ("UST10Y", ">=",  0.05, ALL,      -2, "index", "Yields↑ headwind"),
+    ("UST10Y", "<=", -0.05, ALL,      +2, "index", "Yields↓ tailwind"),
+
+    # 3) Home-currency impact
+    (HOME_CCY, ">=",  5,    ALL,      -1, "index", "{ccy} strong (export headwind)"),
+    (HOME_CCY, "<=", -5,    ALL,      +1, "index", "{ccy} weak (export tailwind)"),
+
+    # 4) Commodity tilt for FTSE & ASX
+    ("WTI",    ">=",  1.0,  "UK100",  +1, "index", "Oil↑ energy boost"),
+    ("WTI",    "<=", -1.0,  "UK100",  -1, "index", "Oil↓ drag"),
+    ("COPPER", ">=",  1.0,  "AUS200", +1, "index", "Copper↑ materials boost"),
+    ("COPPER", "<=", -1.0,  "AUS200", -1, "index", "Copper↓ drag"),
+    ("GOLD",   ">=",  1.0,  "AUS200", +1, "index", "Gold↑ miners help"),
+    ("GOLD",   "<=", -1.0,  "AUS200", -1, "index", "Gold↓ drag"),
+]
+
+# ----------------- COMPILER -----------------
+def compile_rules(rules, targets):
+    """
+    Compile a rule table against an ordered target list
+    Returns a dict of NumPy arrays (rules along the last axis):
+      col  (R,)   input column per rule (MARKET_INPUTS, then HOME_CCY)
+      thr  (R,)   threshold
+      up   (R,)   True for ">=", False for "<="
+      W    (T,R)  signed weight where the rule applies to the target, else 0
+    """
+    inputs = MARKET_INPUTS + [HOME_CCY]
+    index = {t: i for i, t in enumerate(targets)}
+    W = np.zeros((len(targets), len(rules)), dtype=np.int64)
+    for r, (_, _, _, target, weight, _, _) in enumerate(rules):
+        if target == ALL:
+            W[:, r] = weight
+        elif target in index:
+            W[index[target], r] = weight
+
+    return {
+        "targets": list(targets),
+        "col": np.array([inputs.index(rule[0]) for rule in rules], dtype=np.int64),
+        "thr": np.array([rule[2] for rule in rules], dtype=float),
+        "up": np.array([rule[1] == ">=" for rule in rules], dtype=bool),
+        "W": W,
+        "components": np.array([rule[5] for rule in rules]),
+        "notes": [rule[6] for rule in rules],
+    }
+
+def evaluate(compiled, markets, home_scores=None):
+    """
+    Score every target in one vectorized pass
+    - markets: dict[input] -> % change (missing inputs count as 0.0)
+    - home_scores: optional per-target values for the HOME_CCY input
+    Returns (fired (T,R) bool, contributions (T,R) int)
+    """
+    T = len(compiled["targets"])
+    x = np.array([float(markets.get(k, 0.0) or 0.0) for k in MARKET_INPUTS], dtype=float)
+    X = np.empty((T, len(MARKET_INPUTS) + 1), dtype=float)
+    X[:, :-1] = x
+    X[:, -1] = 0.0 if home_scores is None else home_scores
+
+    V = X[:, compiled["col"]]
+    fired = np.where(compiled["up"], V >= compiled["thr"], V <= compiled["thr"]) & (compiled["W"] != 0)
+    return fired, np.where(fired, compiled["W"], 0)
+
+def component_scores(compiled, contributions, component):
+    """Per-target score for one component (e.g. "commodity" or "market")"""
+    return contributions[:, compiled["components"] == component].sum(axis=1)
+
+def target_notes(compiled, fired, t, component=None, **fmt):
+    """Notes for target row t in rule order, optionally for one component"""
+    rules = np.flatnonzero(fired[t])
+    if component is not None:
+        rules = [r for r in rules if compiled["components"][r] == component]
+    return [compiled["notes"][r].format(**fmt) if fmt else compiled["notes"][r] for r in rules]
+
+# ----------------- DEPENDENCY GRAPH -----------------
+def economic_input(ccy):
+    """Graph input for a currency's own releases (FF / TradingEconomics / EconDB)"""
+    return f"ECO:{ccy}"
+
+def build_dependency_graph(currency_rules, index_rules, currencies, pairs, indices):
+    """
+    Map inputs → currencies → pairs / indices from the rule tables and universe
+    - pairs: [(base, quote), ...]; indices: [(code, home_ccy, name), ...]
+    Returns dict of adjacency sets:
+      input_currencies[input] -> {ccy}, input_indices[input] -> {code},
+      currency_pairs[ccy] -> {"BASE/QUOTE"}, currency_indices[ccy] -> {code}
+    """
+    codes = [code for code, _, _ in indices]
+    graph = {"input_currencies": {}, "input_indices": {}, "currency_pairs": {}, "currency_indices": {}}
+
+    for inp, _, _, target, _, _, _ in currency_rules:
+        targets = currencies if target == ALL else [t for t in [target] if t in currencies]
+        graph["input_currencies"].setdefault(inp, set()).update(targets)
+    for ccy in currencies:
+        graph["input_currencies"].setdefault(economic_input(ccy), set()).add(ccy)
+
+    home_rules = False
+    for inp, _, _, target, _, _, _ in index_rules:
+        if inp == HOME_CCY:
+            home_rules = True
+            continue
+        targets = codes if target == ALL else [t for t in [target] if t in codes]
+        graph["input_indices"].setdefault(inp, set()).update(targets)
+
+    for base, quote in pairs:
+        for ccy in (base, quote):
+            graph["currency_pairs"].setdefault(ccy, set()).add(f"{base}/{quote}")
+    if home_rules:
+        for code, ccy, _ in indices:
+            graph["currency_indices"].setdefault(ccy, set()).add(code)
+    return graph
+
+def affected_nodes(graph, inputs=(), currencies=()):
+    """
+    Everything downstream of a set of changed inputs and/or currencies
+    Returns {"currencies": set, "pairs": set, "indices": set}
+    """
+    ccys = set(currencies)
+    for inp in inputs:
+        ccys |= graph["input_currencies"].get(inp, set())
+
+    pairs, indices = set(), set()
+    for inp in inputs:
+        indices |= graph["input_indices"].get(inp, set())
+    for ccy in ccys:
+        pairs |= graph["currency_pairs"].get(ccy, set())
+        indices |= graph["currency_indices"].get(ccy, set())
+    return {"currencies": ccys, "pairs": pairs, "indices": indices}
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+One shared Supabase client per process, created on first use
+- Importing a job module no longer builds a client (or imports supabase)
+- Missing credentials raise when the first query runs, not at import
+"""
+import os, threading
+
+_client = None
+_lock = threading.Lock()
+
+def get_client():
+    """The process-wide Supabase client"""
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                url = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
+                key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+                if not url or not key:
+                    raise ValueError("Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
+                from supabase import create_client
+                _client = create_client(url, key)
+    return _client
+
+class _LazyClient:
+    """Module-level `sb` stand-in: attribute access goes to the shared client"""
+    def __getattr__(self, name):
+        return getattr(get_client(), name)
+
+sb = _LazyClient()
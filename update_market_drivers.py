@@ -2,30 +2,65 @@
 """
 Update Market Drivers based on fundamental analysis data
 Analyzes currency scores, bias data, and market conditions to set driver statuses
+- All five analyzers run against one snapshot: latest score per currency + index scores
+- The snapshot comes from the bias engine in-process, or from two reads when run standalone
+  (latest_currency_scores view, falling back to one ordered currency_scores read)
+- Status updates go through the write-behind spool
 """
-import os
 from datetime import datetime
-from supabase import create_client
+from supabase_client import sb
+import write_spool
 
-# Supabase connection
-SB_URL = os.getenv("SUPABASE_URL") or os.getenv("VITE_SUPABASE_URL")
-SB_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+# Indices read for the Global Growth driver
+GROWTH_INDICES = ["US500", "EU50", "UK100", "JP225"]
+# Fallback when the view is missing: newest raw rows to scan (several runs' worth of 10 currencies)
+FALLBACK_SCORE_ROWS = 200
 
-if not SB_URL or not SB_KEY:
-    print("ERROR: Missing SUPABASE_URL or SUPABASE_SERVICE_ROLE_KEY")
-    exit(1)
+def load_snapshot():
+    """
+    Latest driver inputs in two reads
+    Returns {"currencies": {ccy: score row}, "indices": {instrument: score}}
+    """
+    currencies = {}
+    try:
+        # latest_currency_scores: one row per currency (create_latest_currency_scores_view.sql)
+        result = sb.table("latest_currency_scores").select("*").execute()
+        currencies = {row["currency"]: row for row in result.data}
+    except Exception as e:
+        print(f"⚠️ latest_currency_scores unavailable ({e}), reading currency_scores")
+        try:
+            # Newest first, so the first row seen per currency is its latest
+            result = (sb.table("currency_scores").select("*")
+                      .order("created_at", desc=True).limit(FALLBACK_SCORE_ROWS).execute())
+            for row in result.data:
+                currencies.setdefault(row["currency"], row)
+        except Exception as e:
+            print(f"Error loading currency scores: {e}")
+
+    indices = {}
+    try:
+        result = sb.table("index_bias").select("instrument,score").in_("instrument", GROWTH_INDICES).execute()
+        indices = {row["instrument"]: row.get("score", 0) for row in result.data}
+    except Exception as e:
+        print(f"Error loading index scores: {e}")
+
+    return {"currencies": currencies, "indices": indices}
 
-sb = create_client(SB_URL, SB_KEY)
+def snapshot_from_scores(per_ccy, index_rows):
+    """Driver snapshot from the bias engine's in-memory per_ccy and index rows (no reads)"""
+    return {
+        "currencies": dict(per_ccy),
+        "indices": {row["instrument"]: row.get("score", 0) for row in index_rows},
+    }
 
-def analyze_fed_policy():
+def analyze_fed_policy(snapshot):
     """Analyze Fed Rate Policy based on USD strength and DXY trends"""
     try:
         # Get USD currency score
-        result = sb.table("currency_scores").select("*").eq("currency", "USD").execute()
-        if not result.data:
+        usd_data = snapshot["currencies"].get("USD")
+        if not usd_data:
             return "Neutral", "No USD data"
         
-        usd_data = result.data[0]
         total_score = usd_data.get("total_score", 0)
         cb_tone = usd_data.get("cb_tone_score", 0)
         
@@ -46,17 +81,11 @@ def analyze_fed_policy():
         print(f"Error analyzing Fed policy: {e}")
         return "Neutral", "Analysis error"
 
-def analyze_global_growth():
+def analyze_global_growth(snapshot):
     """Analyze Global Growth based on equity indices performance"""
     try:
         # Get major indices (SPX, EU50, UK100, JP225)
-        indices = ["US500", "EU50", "UK100", "JP225"]
-        scores = []
-        
-        for idx in indices:
-            result = sb.table("index_bias").select("score").eq("instrument", idx).execute()
-            if result.data:
-                scores.append(result.data[0].get("score", 0))
+        scores = [snapshot["indices"][idx] for idx in GROWTH_INDICES if idx in snapshot["indices"]]
         
         if not scores:
             return "Neutral", "No index data"
@@ -80,23 +109,15 @@ def analyze_global_growth():
         print(f"Error analyzing global growth: {e}")
         return "Neutral", "Analysis error"
 
-def analyze_inflation():
+def analyze_inflation(snapshot):
     """Analyze Inflation Trends based on USD, EUR, GBP strength and Gold"""
     try:
         # Get major currency scores (inflation indicators)
-        currencies = ["USD", "EUR", "GBP"]
-        scores = []
-        
-        for curr in currencies:
-            result = sb.table("currency_scores").select("data_score").eq("currency", curr).execute()
-            if result.data:
-                scores.append(result.data[0].get("data_score", 0))
+        currencies = snapshot["currencies"]
+        scores = [currencies[curr].get("data_score", 0) for curr in ["USD", "EUR", "GBP"] if curr in currencies]
         
         # Get Gold score (inflation hedge)
-        gold_result = sb.table("currency_scores").select("total_score").eq("currency", "XAU").execute()
-        gold_score = 0
-        if gold_result.data:
-            gold_score = gold_result.data[0].get("total_score", 0)
+        gold_score = currencies.get("XAU", {}).get("total_score", 0)
         
         if not scores:
             return "Neutral", "No inflation data"
@@ -120,16 +141,12 @@ def analyze_inflation():
         print(f"Error analyzing inflation: {e}")
         return "Neutral", "Analysis error"
 
-def analyze_geopolitical_risk():
+def analyze_geopolitical_risk(snapshot):
     """Analyze Geopolitical Risk based on safe-haven currencies (JPY, CHF, Gold)"""
     try:
         # Get safe-haven assets
-        safe_havens = {"JPY": 0, "CHF": 0, "XAU": 0}
-        
-        for asset in safe_havens.keys():
-            result = sb.table("currency_scores").select("total_score").eq("currency", asset).execute()
-            if result.data:
-                safe_havens[asset] = result.data[0].get("total_score", 0)
+        currencies = snapshot["currencies"]
+        safe_havens = {asset: currencies.get(asset, {}).get("total_score", 0) for asset in ["JPY", "CHF", "XAU"]}
         
         avg_safe_haven = sum(safe_havens.values()) / len(safe_havens)
         
@@ -148,17 +165,16 @@ def analyze_geopolitical_risk():
         print(f"Error analyzing geopolitical risk: {e}")
         return "Moderate", "Analysis error"
 
-def analyze_oil_prices():
+def analyze_oil_prices(snapshot):
     """Analyze Oil Prices based on CAD and commodity trends"""
     try:
         # Get CAD (oil proxy) and commodity currencies
-        result = sb.table("currency_scores").select("*").eq("currency", "CAD").execute()
+        cad_data = snapshot["currencies"].get("CAD")
         
-        if not result.data:
+        if not cad_data:
             return "Neutral", "No commodity data"
         
-        cad_data = result.data[0]
-        commodity_score = cad_data.get("commodity_correlation", 0)
+        commodity_score = cad_data.get("commodity_score", 0)
         total_score = cad_data.get("total_score", 0)
         
         # Analyze oil trend
@@ -178,17 +194,22 @@ def analyze_oil_prices():
         print(f"Error analyzing oil prices: {e}")
         return "Neutral", "Analysis error"
 
-def update_drivers():
-    """Update all market drivers"""
+def update_drivers(snapshot=None):
+    """
+    Update all market drivers
+    - snapshot: from snapshot_from_scores() (bias engine); None → load_snapshot()
+    """
     print(f"[{datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')} UTC] Updating Market Drivers...")
+    if snapshot is None:
+        snapshot = load_snapshot()
     
     # Analyze each driver
     drivers = {
-        "Fed Rate Policy": analyze_fed_policy(),
-        "Global Growth": analyze_global_growth(),
-        "Inflation Trends": analyze_inflation(),
-        "Geopolitical Risk": analyze_geopolitical_risk(),
-        "Oil Prices": analyze_oil_prices(),
+        "Fed Rate Policy": analyze_fed_policy(snapshot),
+        "Global Growth": analyze_global_growth(snapshot),
+        "Inflation Trends": analyze_inflation(snapshot),
+        "Geopolitical Risk": analyze_geopolitical_risk(snapshot),
+        "Oil Prices": analyze_oil_prices(snapshot),
     }
     
     # Update database
@@ -198,11 +219,11 @@ def update_drivers():
         impact = "High" if "Fed" in driver or "Inflation" in driver else "Medium"
         
         try:
-            sb.table("market_drivers").update({
+            write_spool.enqueue("market_drivers", write_spool.UPDATE, {
                 "status": status,
                 "impact": impact,
                 "updated_at": datetime.utcnow().isoformat()
-            }).eq("driver", driver).execute()
+            }, match={"driver": driver})
             
             updates.append(f"{driver}: {status}")
             print(f"  ✅ {driver}: {status} ({description})")
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+Durable write-behind spool for Supabase publishing
+- Writes go into a local SQLite (WAL) queue and return immediately
+- Ops are ordered per stream (table, op, conflict key); a flusher thread drains every stream
+  in order, coalescing consecutive writes of one stream into one bulk request per batch
+- Upserts and keyed updates are idempotent; inserts are too when the table takes a
+  client-side key (on_conflict), so a retry after a timeout or a crash can't duplicate rows
+- A failed op backs off exponentially and blocks only the ops behind it in its own stream;
+  rejected writes (4xx, constraint/schema errors) are parked as dead at once, and an op that
+  keeps failing is parked after MAX_ATTEMPTS, so nothing can wedge the queue
+- Upserts queued with fingerprint=True are recorded in publish_state only once delivered
+- Ops left over when a process exits are sent by the next process's flusher
+"""
+import os, json, time, sqlite3, threading, uuid
+from bar_cache import CACHE_DIR
+from supabase_client import get_client
+import publish_state
+
+# ----------------- CONFIG -----------------
+SPOOL_DB = os.path.join(CACHE_DIR, "write_spool.sqlite3")
+
+# SUPABASE_WRITE_BEHIND=0 → flush synchronously on every enqueue (old blocking behaviour)
+WRITE_BEHIND = os.getenv("SUPABASE_WRITE_BEHIND", "1") != "0"
+BATCH_ROWS = int(os.getenv("SUPABASE_WRITE_BATCH", "500"))
+# How long the flusher keeps retrying before the process may exit (ops stay spooled)
+FLUSH_DEADLINE = float(os.getenv("SUPABASE_FLUSH_DEADLINE", "60"))
+BASE_BACKOFF = 5
+MAX_BACKOFF = 10 * 60
+MAX_ATTEMPTS = 20
+LEASE_SECONDS = 60           # one flusher at a time across processes
+# PostgREST request/schema/auth errors and Postgres data, auth, constraint and undefined-object
+# errors: resending the same rows can't succeed, so the op is parked at once
+NON_RETRYABLE_CODES = ("PGRST1", "PGRST2", "PGRST3", "22", "23", "28", "42")
+
+INSERT, UPSERT, UPDATE = "insert", "upsert", "update"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ops (
+  seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+  tbl          TEXT NOT NULL,
+  op           TEXT NOT NULL,
+  on_conflict  TEXT,
+  match        TEXT,
+  rows         TEXT NOT NULL,
+  created      REAL NOT NULL,
+  attempts     INTEGER NOT NULL DEFAULT 0,
+  next_attempt REAL NOT NULL DEFAULT 0,
+  last_error   TEXT,
+  dead         INTEGER NOT NULL DEFAULT 0,
+  fingerprint  INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_ops_pending ON ops (dead, seq);
+CREATE INDEX IF NOT EXISTS idx_ops_stream ON ops (dead, tbl, op, on_conflict, seq);
+CREATE TABLE IF NOT EXISTS lease (
+  name    TEXT PRIMARY KEY,
+  owner   TEXT NOT NULL,
+  expires REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+_flusher = None
+_owner = uuid.uuid4().hex
+
+def _conn():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        conn = sqlite3.connect(SPOOL_DB, timeout=10, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(ops)")}
+        if "fingerprint" not in columns:
+            # Spool created before fingerprint tracking
+            conn.execute("ALTER TABLE ops ADD COLUMN fingerprint INTEGER NOT NULL DEFAULT 0")
+        _local.conn = conn
+    return conn
+
+# ----------------- ENQUEUE -----------------
+def enqueue(table, op, rows, on_conflict=None, match=None, fingerprint=False):
+    """
+    Durably queue a write and start the flusher
+    - op=INSERT: plain insert; with on_conflict the rows are flushed as upsert-ignore on that
+      client-side key (idempotent retries). A single UUID column (e.g. "id") is filled in when
+      missing; a composite key (e.g. "currency,run_id") must be set by the caller.
+      Leave it unset for tables whose id is server-generated (SERIAL)
+    - op=UPSERT: on_conflict names the key column(s), e.g. "pair" or "currency,resolution,bucket"
+    - op=UPDATE: one values dict in rows, applied where every match column equals its value
+    - fingerprint=True (UPSERT): publish_state.mark_published once the rows are delivered
+    """
+    rows = [rows] if isinstance(rows, dict) else list(rows)
+    if not rows:
+        return 0
+    if op == INSERT and on_conflict and "," not in on_conflict:
+        rows = [row if row.get(on_conflict) else dict(row, **{on_conflict: str(uuid.uuid4())}) for row in rows]
+    _conn().execute(
+        "INSERT INTO ops (tbl, op, on_conflict, match, rows, created, fingerprint) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (table, op, on_conflict, json.dumps(match) if match else None,
+         json.dumps(rows, default=str), time.time(), int(fingerprint and op == UPSERT)),
+    )
+    if WRITE_BEHIND:
+        start_flusher()
+    else:
+        flush()
+    return len(rows)
+
+# ----------------- FLUSH -----------------
+def _take_lease():
+    conn = _conn()
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("SELECT owner, expires FROM lease WHERE name='flush'").fetchone()
+        if row and row[0] != _owner and row[1] > now:
+            conn.execute("COMMIT")
+            return False
+        conn.execute("INSERT OR REPLACE INTO lease (name, owner, expires) VALUES ('flush', ?, ?)",
+                     (_owner, now + LEASE_SECONDS))
+        conn.execute("COMMIT")
+        return True
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def _release_lease():
+    _conn().execute("DELETE FROM lease WHERE name='flush' AND owner=?", (_owner,))
+
+def _key(row, on_conflict):
+    return tuple(row.get(col.strip()) for col in on_conflict.split(","))
+
+def _heads():
+    """Oldest pending op of every stream: [(seq, tbl, op, on_conflict, next_attempt)] by seq"""
+    return _conn().execute(
+        "SELECT o.seq, o.tbl, o.op, o.on_conflict, o.next_attempt FROM ops o "
+        "JOIN (SELECT MIN(seq) AS seq FROM ops WHERE dead=0 GROUP BY tbl, op, on_conflict) h "
+        "ON o.seq = h.seq ORDER BY o.seq"
+    ).fetchall()
+
+def _next_batch():
+    """
+    Head of the oldest stream that isn't backing off: it and the ops behind it in the
+    same (table, op, on_conflict) stream, up to BATCH_ROWS rows
+    """
+    now = time.time()
+    head = next((h for h in _heads() if h[4] <= now), None)
+    if head is None:
+        return None
+    seq, table, op, on_conflict, _ = head
+    ops = _conn().execute(
+        "SELECT seq, tbl, op, on_conflict, match, rows, attempts, fingerprint FROM ops "
+        "WHERE dead=0 AND tbl=? AND op=? AND on_conflict IS ? AND seq>=? ORDER BY seq LIMIT 200",
+        (table, op, on_conflict, seq),
+    ).fetchall()
+    batch = [ops[0]]
+    count = len(json.loads(ops[0][5]))
+    if op != UPDATE:
+        for item in ops[1:]:
+            size = len(json.loads(item[5]))
+            if count + size > BATCH_ROWS:
+                break
+            batch.append(item)
+            count += size
+    return batch
+
+def _send(batch):
+    _, table, op, on_conflict, match, _, _, _ = batch[0]
+    sb = get_client()
+    if op == UPDATE:
+        values = json.loads(batch[0][5])[0]
+        query = sb.table(table).update(values)
+        for col, value in json.loads(match).items():
+            query = query.eq(col, value)
+        query.execute()
+        return 1
+
+    if op == INSERT and not on_conflict:
+        rows = [r for item in batch for r in json.loads(item[5])]
+        sb.table(table).insert(rows).execute()
+        return len(rows)
+
+    # Later writes win within a batch; Postgres rejects an upsert that hits one key twice
+    merged = {}
+    for row in (r for item in batch for r in json.loads(item[5])):
+        merged[_key(row, on_conflict)] = row
+    rows = list(merged.values())
+    if op == INSERT:
+        sb.table(table).upsert(rows, on_conflict=on_conflict, ignore_duplicates=True).execute()
+    else:
+        sb.table(table).upsert(rows, on_conflict=on_conflict).execute()
+    return len(rows)
+
+def _retryable(error):
+    """False for writes the server rejected outright (resending the same rows can't succeed)"""
+    code = getattr(error, "code", None)
+    if isinstance(code, int):
+        # Non-JSON error body: postgrest reports the HTTP status as the code
+        return code in (408, 429) or code >= 500
+    return not (isinstance(code, str) and code.startswith(NON_RETRYABLE_CODES))
+
+def _delivered(batch):
+    """Drop sent ops from the spool and fingerprint the ones that asked for it"""
+    seqs = [item[0] for item in batch]
+    _conn().execute(f"DELETE FROM ops WHERE seq IN ({','.join('?' * len(seqs))})", seqs)
+    for item in batch:
+        if item[7]:
+            publish_state.mark_published(item[1], item[3], json.loads(item[5]))
+
+def _failed(batch, error):
+    """Back the ops off, or park them as dead; returns True if they were parked"""
+    seqs = [item[0] for item in batch]
+    attempts = batch[0][6] + 1
+    retryable = _retryable(error)
+    dead = not retryable or attempts >= MAX_ATTEMPTS
+    backoff = min(MAX_BACKOFF, BASE_BACKOFF * 2 ** (attempts - 1))
+    _conn().execute(
+        f"UPDATE ops SET attempts=?, next_attempt=?, last_error=?, dead=? WHERE seq IN ({','.join('?' * len(seqs))})",
+        (attempts, time.time() + backoff, str(error)[:500], int(dead), *seqs),
+    )
+    reason = "rejected, parked as dead" if not retryable else (
+        "parked as dead" if dead else f"retry in {backoff:.0f}s")
+    print(f"⚠️ Spool: {batch[0][1]} {batch[0][2]} ({len(seqs)} ops) failed "
+          f"(attempt {attempts}, {reason}): {error}")
+    return dead
+
+def flush(deadline=None):
+    """
+    Drain every stream in order until the spool is empty, every stream head is backing off,
+    or the deadline passes
+    Returns the number of rows sent
+    """
+    if not _take_lease():
+        return 0
+    sent = 0
+    try:
+        while deadline is None or time.monotonic() < deadline:
+            batch = _next_batch()
+            if batch is None:
+                break
+            try:
+                sent += _send(batch)
+                _delivered(batch)
+            except Exception as e:
+                if len(batch) == 1 or _retryable(e):
+                    _failed(batch, e)
+                else:
+                    # Some op in the batch was rejected: resend one at a time to park only it,
+                    # stopping at the first retryable failure to keep the stream's order
+                    for item in batch:
+                        try:
+                            sent += _send([item])
+                            _delivered([item])
+                        except Exception as item_error:
+                            if not _failed([item], item_error):
+                                break
+            _conn().execute("UPDATE lease SET expires=? WHERE name='flush' AND owner=?",
+                            (time.time() + LEASE_SECONDS, _owner))
+    finally:
+        _release_lease()
+    return sent
+
+def _head_wait():
+    """Seconds until some stream head may be sent (0 = now), or None if the spool is empty"""
+    heads = _heads()
+    return None if not heads else max(0.0, min(h[4] for h in heads) - time.time())
+
+def _flush_loop():
+    global _flusher
+    deadline = time.monotonic() + FLUSH_DEADLINE
+    drained = False
+    try:
+        while True:
+            flush(deadline)
+            wait = _head_wait()
+            drained = wait is None
+            if drained or wait >= deadline - time.monotonic():
+                break
+            # Head op is backing off, or another process holds the lease
+            time.sleep(max(wait, 0.5))
+    except Exception as e:
+        print(f"⚠️ Spool flusher stopped: {e}")
+    finally:
+        with _lock:
+            _flusher = None
+    if drained and _head_wait() == 0:
+        # Something was enqueued after the last pass
+        start_flusher()
+
+def start_flusher():
+    """Start the background flusher if it isn't running"""
+    global _flusher
+    with _lock:
+        if _flusher is not None:
+            return
+        # Non-daemon: a cron process sends its writes (up to FLUSH_DEADLINE) before exiting
+        _flusher = threading.Thread(target=_flush_loop, name="write-spool-flush")
+        _flusher.start()
+
+def wait(timeout=None):
+    """Block until the running flusher finishes (e.g. before reporting a run as published)"""
+    thread = _flusher
+    if thread is not None:
+        thread.join(timeout)
+
+# ----------------- STATUS -----------------
+def pending():
+    """Queue depth: {"ops", "ready" (not backing off), "dead", "oldest_age"}"""
+    now = time.time()
+    ops, ready, oldest = _conn().execute(
+        "SELECT COUNT(*), SUM(next_attempt <= ?), MIN(created) FROM ops WHERE dead=0", (now,)
+    ).fetchone()
+    dead = _conn().execute("SELECT COUNT(*) FROM ops WHERE dead=1").fetchone()[0]
+    return {"ops": ops, "ready": ready or 0, "dead": dead,
+            "oldest_age": now - oldest if oldest else 0.0}
+
+def requeue_dead():
+    """Give parked ops another round of attempts (after fixing whatever rejected them)"""
+    return _conn().execute(
+        "UPDATE ops SET dead=0, attempts=0, next_attempt=0 WHERE dead=1"
+    ).rowcount
+
+if __name__ == "__main__":
+    import sys
+    if "--requeue-dead" in sys.argv:
+        print(f"Requeued {requeue_dead()} dead ops")
+    print(f"Spool before: {pending()}")
+    print(f"Sent {flush()} rows")
+    print(f"Spool after: {pending()}")